@@ -24,6 +24,7 @@ else
     # 重建并重启 Docker 容器
     docker build -t stockview .
     docker rm -f stockview
-    docker run -d --name stockview -p 8501:8501 stockview
+    docker run -d --name stockview -p 8501:8501 \
+        -v /root/streamlit/.cache:/app/.cache stockview
     echo "Deployment completed"
 fi
\ No newline at end of file
@@ -2,77 +2,82 @@ from __future__ import annotations
 
 import argparse
 import json
-from bisect import bisect_right, insort
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from fractions import Fraction
+from multiprocessing import shared_memory
 from pathlib import Path
 
-import akshare as ak
+import akshare
 import numpy as np
 import pandas as pd
 
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from stockview.akcache import CacheWrapper, akshare_ttl_policy, history_store
+from stockview.index_snapshot import IndexSpotSnapshot
+from stockview.neighbors import EUCLIDEAN, MAHALANOBIS, FeatureSpace, smallest_k_order
+from stockview.percentiles import PercentileIndex, rolling_percentiles
+
+ak = CacheWrapper(akshare, cache_time=300, ttl_policy=akshare_ttl_policy)
 
 INDEX_START_DATE = "20050101"
 FUTURES_START_DATE = "20220101"
 END_DATE = "20260310"
 
+STATE_COLUMNS = [
+    "price_ratio",
+    "pe_ratio",
+    "zz1000_pair_share",
+    "zz1000_market_share",
+    "total_market_amount",
+]
+WALK_FORWARD_FILE = "walk_forward.csv"
 
-def percentile_rank(series: pd.Series, value: float) -> float:
-    sorted_values = pd.Series(series).dropna().astype(float).sort_values().tolist()
-    if not sorted_values:
-        return float("nan")
-    return bisect_right(sorted_values, float(value)) / len(sorted_values)
-
-
-def expanding_percentiles(values: list[float]) -> list[float]:
-    seen: list[float] = []
-    output: list[float] = []
-    for raw_value in values:
-        value = float(raw_value)
-        insort(seen, value)
-        output.append(bisect_right(seen, value) / len(seen))
-    return output
+# 默认用于匹配历史相似状态的特征
+DEFAULT_FEATURES = (
+    "price_ratio_pct",
+    "pe_ratio_pct",
+    "zz1000_pair_share_pct",
+    "total_market_amount_pct",
+)
 
 
 def fetch_current_index_snapshot() -> dict[str, float]:
-    important = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
-    sh_series = ak.stock_zh_index_spot_em(symbol="上证系列指数")
-    sz_series = ak.stock_zh_index_spot_em(symbol="深证系列指数")
-
-    hs300 = important.loc[important["代码"] == "000300"].iloc[0]
-    zz1000 = important.loc[important["代码"] == "000852"].iloc[0]
-    sh = sh_series.loc[sh_series["代码"] == "000001"].iloc[0]
-    sz = sz_series.loc[sz_series["代码"] == "399001"].iloc[0]
+    snapshot = IndexSpotSnapshot.fetch(
+        ak, boards=("上证系列指数", "深证系列指数", "沪深重要指数")
+    )
 
-    total_amount = float(sh["成交额"]) + float(sz["成交额"])
-    hs300_amount = float(hs300["成交额"])
-    zz1000_amount = float(zz1000["成交额"])
+    total_amount = snapshot.amount("000001") + snapshot.amount("399001")
+    hs300_amount = snapshot.amount("000300")
+    zz1000_amount = snapshot.amount("000852")
 
     return {
         "snapshot_date": END_DATE,
-        "hs300_price": float(hs300["最新价"]),
-        "zz1000_price": float(zz1000["最新价"]),
+        "hs300_price": snapshot.price("000300"),
+        "zz1000_price": snapshot.price("000852"),
         "hs300_amount": hs300_amount,
         "zz1000_amount": zz1000_amount,
         "total_market_amount": total_amount,
-        "price_ratio": float(hs300["最新价"]) / float(zz1000["最新价"]),
+        "price_ratio": snapshot.price("000300") / snapshot.price("000852"),
         "zz1000_market_share": zz1000_amount / total_amount,
         "zz1000_pair_share": zz1000_amount / (zz1000_amount + hs300_amount),
     }
 
 
 def fetch_index_history() -> pd.DataFrame:
-    hs300 = ak.index_zh_a_hist(
-        symbol="000300", period="daily", start_date=INDEX_START_DATE, end_date=END_DATE
-    )
-    zz1000 = ak.index_zh_a_hist(
-        symbol="000852", period="daily", start_date=INDEX_START_DATE, end_date=END_DATE
-    )
-    sh = ak.index_zh_a_hist(
-        symbol="000001", period="daily", start_date=INDEX_START_DATE, end_date=END_DATE
-    )
-    sz = ak.index_zh_a_hist(
-        symbol="399001", period="daily", start_date=INDEX_START_DATE, end_date=END_DATE
-    )
+    hs300, zz1000, sh, sz = [
+        history_store.get(
+            "index_zh_a_hist",
+            symbol=symbol,
+            start_date=INDEX_START_DATE,
+            end_date=END_DATE,
+            period="daily",
+        )
+        for symbol in ["000300", "000852", "000001", "399001"]
+    ]
 
     for item in [hs300, zz1000, sh, sz]:
         item["日期"] = pd.to_datetime(item["日期"])
@@ -159,11 +164,17 @@ def fetch_current_futures_snapshot() -> dict[str, float]:
 
 
 def fetch_futures_history() -> pd.DataFrame:
-    if0 = ak.futures_main_sina(
-        symbol="IF0", start_date=FUTURES_START_DATE, end_date=END_DATE
+    if0 = history_store.get(
+        "futures_main_sina",
+        symbol="IF0",
+        start_date=FUTURES_START_DATE,
+        end_date=END_DATE,
     )
-    im0 = ak.futures_main_sina(
-        symbol="IM0", start_date=FUTURES_START_DATE, end_date=END_DATE
+    im0 = history_store.get(
+        "futures_main_sina",
+        symbol="IM0",
+        start_date=FUTURES_START_DATE,
+        end_date=END_DATE,
     )
 
     for item in [if0, im0]:
@@ -185,7 +196,10 @@ def fetch_futures_history() -> pd.DataFrame:
 
 
 def build_state_frame(
-    index_history: pd.DataFrame, pe_history: pd.DataFrame, futures_history: pd.DataFrame
+    index_history: pd.DataFrame,
+    pe_history: pd.DataFrame,
+    futures_history: pd.DataFrame,
+    percentile_window: int | None = None,
 ) -> pd.DataFrame:
     state = (
         futures_history.merge(
@@ -206,57 +220,96 @@ def build_state_frame(
         .reset_index(drop=True)
     )
 
-    for column in [
-        "price_ratio",
-        "pe_ratio",
-        "zz1000_pair_share",
-        "zz1000_market_share",
-        "total_market_amount",
-    ]:
-        state[f"{column}_pct"] = expanding_percentiles(state[column].tolist())
+    # 所有特征列一次计算；percentile_window 为空时是全部历史的分位，否则只看最近若干交易日
+    percentiles = rolling_percentiles(
+        state[STATE_COLUMNS].to_numpy(dtype=float), percentile_window
+    )
+    for position, column in enumerate(STATE_COLUMNS):
+        state[f"{column}_pct"] = percentiles[:, position]
     return state
 
 
+def build_percentile_index(
+    index_history: pd.DataFrame,
+    pe_history: pd.DataFrame,
+    window: int | None = None,
+) -> PercentileIndex:
+    columns = {
+        column: index_history[column]
+        for column in STATE_COLUMNS
+        if column in index_history
+    }
+    columns["pe_ratio"] = pe_history["pe_ratio"]
+    return PercentileIndex.from_columns(columns, window=window)
+
+
+def pair_trades(state: pd.DataFrame, horizon: int) -> dict[str, np.ndarray]:
+    """每个交易日开仓、持有 horizon 个交易日的 做多 IF / 做空 IM 配对收益（按行对齐）。"""
+    if_close = state["if_close"].to_numpy(dtype=float)
+    im_close = state["im_close"].to_numpy(dtype=float)
+    if_exit = np.full(len(state), np.nan)
+    im_exit = np.full(len(state), np.nan)
+    if horizon < len(state):
+        if_exit[: len(state) - horizon] = if_close[horizon:]
+        im_exit[: len(state) - horizon] = im_close[horizon:]
+    hedge_ratio = if_close * 300 / (im_close * 200)
+    pnl = (if_exit - if_close) * 300 - hedge_ratio * (im_exit - im_close) * 200
+    gross_notional = if_close * 300 + hedge_ratio * im_close * 200
+    return {
+        "if_exit": if_exit,
+        "im_exit": im_exit,
+        "hedge_ratio": hedge_ratio,
+        "pnl": pnl,
+        "gross_notional": gross_notional,
+        "return": pnl / gross_notional,
+    }
+
+
 def compute_trade_stats(
     state: pd.DataFrame,
     current_features: dict[str, float],
     horizons: list[int],
     neighbors: int,
     exclude_recent_days: int,
+    weights: dict[str, float] | None = None,
+    metric: str = EUCLIDEAN,
 ) -> tuple[dict[str, dict[str, float]], dict[str, pd.DataFrame], dict[str, dict[str, float]]]:
     results: dict[str, dict[str, float]] = {}
     nearest_samples: dict[str, pd.DataFrame] = {}
     baseline: dict[str, dict[str, float]] = {}
 
+    # 特征相同，距离只算一次，各持有期共用
+    space = FeatureSpace.from_frame(state, current_features, weights=weights, metric=metric)
+    distances = space.distances(current_features)
+    complete = state.notna().all(axis=1).to_numpy()
+    # 任一持有期不可用的行不超过：缺失行及其前 horizon 行 + 末尾 horizon 行 + 排除的最近几天，
+    # 按距离取出 neighbors + 这些行数的候选，就一定包含每个持有期的最近 neighbors 个样本
+    reserve = 2 * int((~complete).sum()) + max(horizons, default=0) + exclude_recent_days
+    candidates = smallest_k_order(distances, neighbors + reserve)
+
     for horizon in horizons:
-        sample = state.copy()
-        sample["if_exit"] = sample["if_close"].shift(-horizon)
-        sample["im_exit"] = sample["im_close"].shift(-horizon)
-        sample = sample.dropna().copy()
-        sample["hedge_ratio"] = sample["if_close"] * 300 / (sample["im_close"] * 200)
-        sample["pnl"] = (sample["if_exit"] - sample["if_close"]) * 300 - sample[
-            "hedge_ratio"
-        ] * (sample["im_exit"] - sample["im_close"]) * 200
-        sample["gross_notional"] = sample["if_close"] * 300 + sample[
-            "hedge_ratio"
-        ] * sample["im_close"] * 200
-        sample["return"] = sample["pnl"] / sample["gross_notional"]
+        trades = pair_trades(state, horizon)
+        sample_rows = np.flatnonzero(complete & ~np.isnan(trades["pnl"]))
+        pnl, returns = trades["pnl"][sample_rows], trades["return"][sample_rows]
 
         baseline[str(horizon)] = {
-            "count": int(len(sample)),
-            "win_rate": float((sample["pnl"] > 0).mean()),
-            "avg_return": float(sample["return"].mean()),
-            "avg_pnl": float(sample["pnl"].mean()),
+            "count": int(len(sample_rows)),
+            "win_rate": float((pnl > 0).mean()),
+            "avg_return": float(returns.mean()),
+            "avg_pnl": float(pnl.mean()),
         }
 
-        working = sample.iloc[:-exclude_recent_days].copy()
-        for feature_name, value in current_features.items():
-            working[f"{feature_name}_dist"] = (working[feature_name] - value) ** 2
-        working["distance"] = np.sqrt(
-            working[[column for column in working.columns if column.endswith("_dist")]]
-            .sum(axis=1)
-        )
-        nearest = working.nsmallest(neighbors, "distance").copy()
+        eligible = np.zeros(len(state), dtype=bool)
+        eligible[sample_rows[: max(len(sample_rows) - exclude_recent_days, 0)]] = True
+        rows = candidates[eligible[candidates]][:neighbors]
+
+        nearest = state.iloc[rows].copy()
+        for column, values in trades.items():
+            nearest[column] = values[rows]
+        contributions = space.contributions(current_features, rows)
+        for position, feature_name in enumerate(space.names):
+            nearest[f"{feature_name}_dist"] = contributions[:, position]
+        nearest["distance"] = distances[rows]
         nearest_samples[str(horizon)] = nearest
 
         results[str(horizon)] = {
@@ -271,6 +324,78 @@ def compute_trade_stats(
     return results, nearest_samples, baseline
 
 
+def walk_forward(
+    state: pd.DataFrame,
+    features: list[str] | tuple[str, ...],
+    horizon: int,
+    neighbors: int,
+    exclude_recent_days: int,
+    weights: dict[str, float] | None = None,
+) -> pd.DataFrame:
+    """
+    逐日回测：把每个历史交易日的状态当作查询，只在当时已经能看到结果的样本中找相似状态。
+
+    第 t 天可用的样本满足 j <= t - max(exclude_recent_days, horizon)，即持有期已经结束且
+    不在排除窗口内。预测值为最近 neighbors 个样本的平均收益/胜率，不足 neighbors 个时为 NaN；
+    baseline_return 为同一可用范围内全部样本的平均收益。
+    """
+    trades = pair_trades(state, horizon)
+    realised = state.notna().all(axis=1).to_numpy() & ~np.isnan(trades["pnl"])
+    gap = max(exclude_recent_days, horizon)
+    space = FeatureSpace.from_frame(state, features, weights=weights)
+    rows, _ = space.causal_neighbors(neighbors, gap, eligible=realised)
+
+    found = rows >= 0
+    count = found.sum(axis=1)
+    enough = count >= neighbors
+    safe_rows = np.where(found, rows, 0)
+
+    def neighbour_mean(values: np.ndarray) -> np.ndarray:
+        total = np.where(found, values[safe_rows], 0.0).sum(axis=1)
+        return np.where(enough, total / np.maximum(count, 1), np.nan)
+
+    returns = np.where(realised, trades["return"], np.nan)
+    pnl = np.where(realised, trades["pnl"], np.nan)
+    # 前缀和：第 t 天可用范围 [0, t - gap] 内全部样本的平均收益
+    cumulative = np.concatenate([[0.0], np.cumsum(np.nan_to_num(returns))])
+    available = np.concatenate([[0], np.cumsum(realised)])
+    upper = np.clip(np.arange(len(state)) - gap + 1, 0, len(state))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        baseline_return = cumulative[upper] / available[upper]
+
+    return pd.DataFrame(
+        {
+            "日期": state["日期"].to_numpy(),
+            "horizon": horizon,
+            "neighbor_count": count,
+            "predicted_return": neighbour_mean(trades["return"]),
+            "predicted_win_rate": neighbour_mean((trades["pnl"] > 0).astype(float)),
+            "predicted_pnl": neighbour_mean(trades["pnl"]),
+            "baseline_return": np.where(enough, baseline_return, np.nan),
+            "realised_return": returns,
+            "realised_pnl": pnl,
+        }
+    )
+
+
+def walk_forward_stats(frame: pd.DataFrame) -> dict[str, float]:
+    """预测与实际都存在的交易日上，预测收益的相关系数和方向准确率。"""
+    scored = frame.dropna(subset=["predicted_return", "realised_return"])
+    if len(scored) < 2:
+        return {"count": int(len(scored))}
+    predicted = scored["predicted_return"].to_numpy()
+    realised = scored["realised_return"].to_numpy()
+    positive = predicted > 0
+    return {
+        "count": int(len(scored)),
+        "correlation": float(np.corrcoef(predicted, realised)[0, 1]),
+        "direction_accuracy": float((np.sign(predicted) == np.sign(realised)).mean()),
+        "avg_return_when_positive": float(realised[positive].mean()) if positive.any() else None,
+        "avg_return_when_negative": float(realised[~positive].mean()) if (~positive).any() else None,
+        "avg_return": float(realised.mean()),
+    }
+
+
 def assess_overheat(metrics: dict[str, float]) -> dict[str, object]:
     structural_heat = (
         metrics["price_ratio_percentile"] <= 0.25
@@ -330,30 +455,93 @@ def main() -> None:
         default="5,10,20",
         help="统计持有期，逗号分隔的交易日列表",
     )
+    parser.add_argument(
+        "--percentile-window",
+        type=int,
+        default=None,
+        help="分位数只看最近若干交易日（例如 750 约为 3 年），默认使用全部历史",
+    )
+    parser.add_argument(
+        "--metric",
+        choices=[EUCLIDEAN, MAHALANOBIS],
+        default=EUCLIDEAN,
+        help="相似状态的距离",
+    )
+    parser.add_argument(
+        "--feature-weights",
+        default="",
+        help="欧氏距离的特征权重，例如 pe_ratio_pct=2,total_market_amount_pct=0.5",
+    )
+    parser.add_argument(
+        "--walk-forward",
+        action="store_true",
+        help=f"逐日回测相似状态信号，预测与实际收益写入 {WALK_FORWARD_FILE}（只用欧氏距离）",
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help=f"参数扫描模式，结果写入 {SWEEP_FILE}",
+    )
+    parser.add_argument(
+        "--sweep-neighbors",
+        default="20,40,60,90,120",
+        help="扫描的相似状态采样数量，逗号分隔",
+    )
+    parser.add_argument(
+        "--sweep-exclude",
+        default="20,40,60",
+        help="扫描的排除最近天数，逗号分隔",
+    )
+    parser.add_argument(
+        "--sweep-features",
+        default="",
+        help="扫描的特征组合，组合之间用分号、特征之间用加号分隔；默认为默认特征及其去掉一个特征的组合",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=None, help="参数扫描的进程数，默认为 CPU 核数"
+    )
     args = parser.parse_args()
 
     horizons = [int(item) for item in args.horizons.split(",") if item.strip()]
+    weights = {
+        name.strip(): float(value)
+        for name, value in (
+            item.split("=") for item in args.feature_weights.split(",") if item.strip()
+        )
+    }
+    if args.sweep:
+        results = run_sweep(
+            output_dir=args.output_dir,
+            neighbor_grid=[int(item) for item in args.sweep_neighbors.split(",") if item.strip()],
+            exclude_grid=[int(item) for item in args.sweep_exclude.split(",") if item.strip()],
+            horizons=horizons,
+            feature_sets=[
+                tuple(name.strip() for name in group.split("+") if name.strip())
+                for group in args.sweep_features.split(";")
+                if group.strip()
+            ],
+            percentile_window=args.percentile_window,
+            metric=args.metric,
+            weights=weights or None,
+            workers=args.workers,
+        )
+        print(results.sort_values("excess_return", ascending=False).head(20).to_string())
+        return
+
     summary = run_analysis(
         output_dir=args.output_dir,
         neighbors=args.neighbors,
         exclude_recent_days=args.exclude_recent_days,
         horizons=horizons,
+        percentile_window=args.percentile_window,
+        metric=args.metric,
+        weights=weights or None,
+        backtest=args.walk_forward,
     )
     print(json.dumps(summary, ensure_ascii=False, indent=2, default=to_serializable))
 
 
-def run_analysis(
-    output_dir: str = "outputs/if_im_style_analysis",
-    neighbors: int = 60,
-    exclude_recent_days: int = 40,
-    horizons: list[int] | None = None,
-) -> dict[str, object]:
-    if horizons is None:
-        horizons = [5, 10, 20]
-
-    output_path = Path(output_dir)
-    output_path.mkdir(parents=True, exist_ok=True)
-
+def load_analysis_inputs(percentile_window: int | None = None) -> dict[str, object]:
     current_index = fetch_current_index_snapshot()
     current_futures = fetch_current_futures_snapshot()
     index_history = fetch_index_history()
@@ -363,39 +551,73 @@ def run_analysis(
         index_history=index_history,
         pe_history=pe_history,
         futures_history=futures_history,
+        percentile_window=percentile_window,
     )
 
-    current_metrics = {
+    latest_pe = pe_history.iloc[-1]
+    current_values = {
         "price_ratio": current_index["price_ratio"],
-        "price_ratio_percentile": percentile_rank(
-            index_history["price_ratio"], current_index["price_ratio"]
-        ),
-        "pe_ratio": float(pe_history.iloc[-1]["pe_ratio"]),
-        "pe_ratio_percentile": percentile_rank(
-            pe_history["pe_ratio"], float(pe_history.iloc[-1]["pe_ratio"])
-        ),
-        "hs300_ttm_pe": float(pe_history.iloc[-1]["hs300_ttm_pe"]),
-        "zz1000_ttm_pe": float(pe_history.iloc[-1]["zz1000_ttm_pe"]),
-        "pe_snapshot_date": pe_history.iloc[-1]["日期"].strftime("%Y-%m-%d"),
+        "pe_ratio": float(latest_pe["pe_ratio"]),
         "zz1000_market_share": current_index["zz1000_market_share"],
-        "zz1000_market_share_percentile": percentile_rank(
-            index_history["zz1000_market_share"], current_index["zz1000_market_share"]
-        ),
         "zz1000_pair_share": current_index["zz1000_pair_share"],
-        "zz1000_pair_share_percentile": percentile_rank(
-            index_history["zz1000_pair_share"], current_index["zz1000_pair_share"]
-        ),
         "total_market_amount": current_index["total_market_amount"],
-        "total_market_amount_percentile": percentile_rank(
-            index_history["total_market_amount"], current_index["total_market_amount"]
-        ),
     }
+    # 当前值的分位与历史状态使用同样的回看窗口
+    percentiles = build_percentile_index(
+        index_history, pe_history, window=percentile_window
+    ).percentiles(current_values)
+
+    current_metrics = {
+        "price_ratio": current_values["price_ratio"],
+        "price_ratio_percentile": percentiles["price_ratio"],
+        "pe_ratio": current_values["pe_ratio"],
+        "pe_ratio_percentile": percentiles["pe_ratio"],
+        "hs300_ttm_pe": float(latest_pe["hs300_ttm_pe"]),
+        "zz1000_ttm_pe": float(latest_pe["zz1000_ttm_pe"]),
+        "pe_snapshot_date": latest_pe["日期"].strftime("%Y-%m-%d"),
+        "zz1000_market_share": current_values["zz1000_market_share"],
+        "zz1000_market_share_percentile": percentiles["zz1000_market_share"],
+        "zz1000_pair_share": current_values["zz1000_pair_share"],
+        "zz1000_pair_share_percentile": percentiles["zz1000_pair_share"],
+        "total_market_amount": current_values["total_market_amount"],
+        "total_market_amount_percentile": percentiles["total_market_amount"],
+    }
+
+    return {
+        "current_index": current_index,
+        "current_futures": current_futures,
+        "state": state,
+        "current_metrics": current_metrics,
+        # 所有可用于相似状态匹配的特征的当前值
+        "current_features": {
+            f"{column}_pct": percentiles[column] for column in STATE_COLUMNS
+        },
+    }
+
 
+def run_analysis(
+    output_dir: str = "outputs/if_im_style_analysis",
+    neighbors: int = 60,
+    exclude_recent_days: int = 40,
+    horizons: list[int] | None = None,
+    percentile_window: int | None = None,
+    metric: str = EUCLIDEAN,
+    weights: dict[str, float] | None = None,
+    backtest: bool = False,
+) -> dict[str, object]:
+    if horizons is None:
+        horizons = [5, 10, 20]
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    inputs = load_analysis_inputs(percentile_window)
+    current_index = inputs["current_index"]
+    current_futures = inputs["current_futures"]
+    state = inputs["state"]
+    current_metrics = inputs["current_metrics"]
     current_state_features = {
-        "price_ratio_pct": current_metrics["price_ratio_percentile"],
-        "pe_ratio_pct": current_metrics["pe_ratio_percentile"],
-        "zz1000_pair_share_pct": current_metrics["zz1000_pair_share_percentile"],
-        "total_market_amount_pct": current_metrics["total_market_amount_percentile"],
+        name: inputs["current_features"][name] for name in DEFAULT_FEATURES
     }
 
     conditional_stats, nearest_samples, baseline_stats = compute_trade_stats(
@@ -404,6 +626,8 @@ def run_analysis(
         horizons=horizons,
         neighbors=neighbors,
         exclude_recent_days=exclude_recent_days,
+        weights=weights,
+        metric=metric,
     )
     overheat = assess_overheat(current_metrics)
 
@@ -424,6 +648,30 @@ def run_analysis(
         "baseline_trade_stats": baseline_stats,
     }
 
+    if backtest:
+        # 逐日回测只支持欧氏距离（马氏距离的协方差会用到未来数据）
+        backtest_frame = pd.concat(
+            [
+                walk_forward(
+                    state,
+                    features=DEFAULT_FEATURES,
+                    horizon=horizon,
+                    neighbors=neighbors,
+                    exclude_recent_days=exclude_recent_days,
+                    weights=weights if metric == EUCLIDEAN else None,
+                )
+                for horizon in horizons
+            ],
+            ignore_index=True,
+        )
+        summary["walk_forward_stats"] = {
+            str(horizon): walk_forward_stats(frame)
+            for horizon, frame in backtest_frame.groupby("horizon")
+        }
+        backtest_frame.to_csv(
+            output_path / WALK_FORWARD_FILE, index=False, encoding="utf-8-sig"
+        )
+
     for horizon, frame in nearest_samples.items():
         frame.to_csv(
             output_path / f"nearest_samples_h{horizon}.csv",
@@ -437,5 +685,165 @@ def run_analysis(
     return summary
 
 
+SWEEP_FILE = "sweep.parquet"
+
+# 子进程通过 pool initializer 挂载共享内存中的 state，每个进程只重建一次
+_sweep_memory: shared_memory.SharedMemory | None = None
+_sweep_state: pd.DataFrame | None = None
+
+
+def share_state(state: pd.DataFrame) -> tuple[shared_memory.SharedMemory, dict[str, object]]:
+    """
+    把 state 复制到共享内存中的 (行数, 列数) float64 矩阵，日期列存为距 1970-01-01 的天数。
+
+    返回共享内存和子进程重建 state 需要的描述，调用方负责 close/unlink。
+    """
+    columns = list(state.columns)
+    matrix = np.column_stack(
+        [
+            state[column].to_numpy(dtype="datetime64[D]").astype(float)
+            if column == "日期"
+            else state[column].to_numpy(dtype=float)
+            for column in columns
+        ]
+    )
+    memory = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+    np.ndarray(matrix.shape, dtype=float, buffer=memory.buf)[:] = matrix
+    return memory, {"name": memory.name, "shape": matrix.shape, "columns": columns}
+
+
+def attach_state(layout: dict[str, object]) -> None:
+    global _sweep_memory, _sweep_state
+    _sweep_memory = shared_memory.SharedMemory(name=layout["name"])
+    matrix = np.ndarray(layout["shape"], dtype=float, buffer=_sweep_memory.buf)
+    state = pd.DataFrame(matrix, columns=layout["columns"], copy=False)
+    state["日期"] = pd.to_datetime(matrix[:, layout["columns"].index("日期")], unit="D")
+    _sweep_state = state
+
+
+def sweep_task(
+    features: dict[str, float],
+    exclude_recent_days: int,
+    neighbor_grid: list[int],
+    horizons: list[int],
+    metric: str,
+    weights: dict[str, float] | None = None,
+    percentile_window: int | None = None,
+) -> list[dict[str, object]]:
+    """一组特征和排除窗口：按最大的 neighbors 查一次，较小的 neighbors 取最近的前若干个。"""
+    # 权重只对本组合中存在的特征生效，记录的也是实际生效的权重
+    weights = {name: weight for name, weight in (weights or {}).items() if name in features}
+    _, nearest_samples, baseline = compute_trade_stats(
+        state=_sweep_state,
+        current_features=features,
+        horizons=horizons,
+        neighbors=max(neighbor_grid),
+        exclude_recent_days=exclude_recent_days,
+        weights=weights or None,
+        metric=metric,
+    )
+    rows = []
+    for horizon in horizons:
+        nearest = nearest_samples[str(horizon)]
+        base = baseline[str(horizon)]
+        for neighbors in neighbor_grid:
+            head = nearest.head(neighbors)
+            avg_return = float(head["return"].mean())
+            rows.append(
+                {
+                    "features": "+".join(features),
+                    "feature_count": len(features),
+                    "metric": metric,
+                    "weights": ",".join(
+                        f"{name}={weight:g}" for name, weight in sorted(weights.items())
+                    ),
+                    "percentile_window": percentile_window,
+                    "neighbors": neighbors,
+                    "exclude_recent_days": exclude_recent_days,
+                    "horizon": horizon,
+                    "count": int(len(head)),
+                    "win_rate": float((head["pnl"] > 0).mean()),
+                    "avg_return": avg_return,
+                    "avg_pnl": float(head["pnl"].mean()),
+                    "baseline_win_rate": base["win_rate"],
+                    "baseline_avg_return": base["avg_return"],
+                    "excess_return": avg_return - base["avg_return"],
+                }
+            )
+    return rows
+
+
+def default_feature_sets() -> list[tuple[str, ...]]:
+    """默认特征组合，以及依次去掉其中一个特征的组合。"""
+    return [DEFAULT_FEATURES] + [
+        tuple(name for name in DEFAULT_FEATURES if name != dropped)
+        for dropped in DEFAULT_FEATURES
+    ]
+
+
+def run_sweep(
+    output_dir: str = "outputs/if_im_style_analysis",
+    neighbor_grid: list[int] | None = None,
+    exclude_grid: list[int] | None = None,
+    horizons: list[int] | None = None,
+    feature_sets: list[tuple[str, ...]] | None = None,
+    percentile_window: int | None = None,
+    metric: str = EUCLIDEAN,
+    weights: dict[str, float] | None = None,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """
+    参数扫描：数据只抓取一次，state 放在共享内存中，(特征组合, 排除窗口) 的网格分给进程池。
+
+    结果写入 output_dir/sweep.parquet，每行是一组 (特征, neighbors, 排除窗口, 持有期)，
+    并记录距离、特征权重和分位数回看窗口，便于区分不同批次的扫描。
+    """
+    neighbor_grid = sorted(neighbor_grid or [20, 40, 60, 90, 120])
+    exclude_grid = exclude_grid or [20, 40, 60]
+    horizons = horizons or [5, 10, 20]
+    feature_sets = feature_sets or default_feature_sets()
+
+    output_path = Path(output_dir)
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    inputs = load_analysis_inputs(percentile_window)
+    current_features = inputs["current_features"]
+    if weights and metric == MAHALANOBIS:
+        raise ValueError("马氏距离不支持特征权重")
+    unknown = (
+        {name for names in feature_sets for name in names} | set(weights or {})
+    ) - set(current_features)
+    if unknown:
+        raise ValueError(f"未知的特征：{', '.join(sorted(unknown))}")
+
+    memory, layout = share_state(inputs["state"])
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=attach_state, initargs=(layout,)
+        ) as executor:
+            futures = [
+                executor.submit(
+                    sweep_task,
+                    {name: current_features[name] for name in names},
+                    exclude_recent_days,
+                    neighbor_grid,
+                    horizons,
+                    metric,
+                    weights,
+                    percentile_window,
+                )
+                for names in feature_sets
+                for exclude_recent_days in exclude_grid
+            ]
+            rows = [row for future in futures for row in future.result()]
+    finally:
+        memory.close()
+        memory.unlink()
+
+    results = pd.DataFrame(rows)
+    results.to_parquet(output_path / SWEEP_FILE, index=False)
+    return results
+
+
 if __name__ == "__main__":
     main()
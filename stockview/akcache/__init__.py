@@ -1,2 +1,14 @@
 from .akcache import CacheWrapper
-__all__ = ["CacheWrapper"]
\ No newline at end of file
+from .history import HistoryStore, history_store
+from .policy import TtlPolicy, akshare_ttl_policy
+from .replay import ReplayBackend, RecordingBackend, resolve_backend
+__all__ = [
+    "CacheWrapper",
+    "HistoryStore",
+    "RecordingBackend",
+    "ReplayBackend",
+    "TtlPolicy",
+    "akshare_ttl_policy",
+    "history_store",
+    "resolve_backend",
+]
\ No newline at end of file
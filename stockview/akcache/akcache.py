@@ -1,38 +1,373 @@
+import os
+import threading
 import time
+import weakref
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from stockview.akcache.disk import DiskCache
+from stockview.akcache.metrics import estimate_size, metrics
+from stockview.akcache.replay import resolve_backend
+from stockview.akcache.shared import SharedSnapshotCache
 from stockview.log import logger
 
 
+# 缓存中的 DataFrame 会被多个调用方共享。开启 Copy-on-Write 后，浅拷贝之间共享数据，
+# 任何一方写入时才真正复制，通过 to_numpy()/values 拿到的数组也是只读的。
+# pandas 3 起 Copy-on-Write 是默认行为，不再需要设置。
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+def shared_view(value):
+    """
+    返回缓存对象的只读共享视图。
+
+    DataFrame/Series 返回浅拷贝：不复制数据，调用方新增列或修改数值只影响自己的副本。
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    return value
+
+
+# 所有 CacheWrapper 实例，供诊断页面汇总缓存占用
+wrappers = weakref.WeakSet()
+
+
+@dataclass
+class CacheEntry:
+    name: str
+    value: object
+    timestamp: float
+    size: int
+    ttl: float
+
+    def fresh(self, current_time):
+        return current_time - self.timestamp < self.ttl
+
+
 class CacheWrapper:
-    def __init__(self, obj, cache_time=180):
-        self.obj = obj
+    """
+    akshare 调用的进程内缓存。
+
+    - 按 LRU 顺序淘汰，总条目数不超过 max_entries；
+    - 按 DataFrame 实际内存统计总字节数，不超过 max_bytes；
+    - 写入新结果时主动清理已过期条目；
+    - function_limits 可以为单个函数设置条目上限，例如
+      {"index_zh_a_hist": 16}，防止某个函数的参数组合挤占整个缓存；
+    - 同一个缓存键同时只发起一次上游请求，其余调用方等待同一个 Future
+      并共享结果（single-flight），多个会话同时冷启动时不会重复抓取；
+    - 可选的磁盘层（disk_dir，默认取环境变量 STOCKVIEW_CACHE_DIR）把结果
+      持久化为 Parquet，内存未命中时先读磁盘，重新部署后不必全部重新抓取；
+    - stale_while_revalidate=True 时，过期条目立即返回并在后台刷新；
+      上游持续报错时继续返回最后一次成功的结果，最长保留 stale_time 秒，
+      可以用 entry_age() 查询数据的实际年龄；
+    - ttl_policy 按函数名和交易时间决定每个条目的 TTL（见 policy.TtlPolicy），
+      未配置时所有条目都使用 cache_time；
+    - shared_dir（默认取环境变量 STOCKVIEW_SHARED_CACHE_DIR）启用跨进程共享快照，
+      调用上游前持有该键的文件锁，同一份数据在多个副本之间只抓取一次；
+    - 返回的 DataFrame 是缓存对象的 Copy-on-Write 浅拷贝（见 shared_view），
+      调用方可以直接派生新列而不会改动缓存，也不需要防御性的 .copy()；
+    - 被包装的对象按 STOCKVIEW_AK_MODE 替换为录制/回放后端（见 replay.py）。
+    """
+
+    def __init__(
+        self,
+        obj,
+        cache_time=180,
+        max_entries=256,
+        max_bytes=256 * 1024 * 1024,
+        function_limits=None,
+        disk_dir=None,
+        stale_while_revalidate=False,
+        stale_time=0,
+        ttl_policy=None,
+        shared_dir=None,
+    ):
+        self.obj = resolve_backend(obj)
         self.cache_time = cache_time
-        self.cache = {}
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.function_limits = dict(function_limits or {})
+        self.cache = OrderedDict()
+        self.total_bytes = 0
+        self._function_counts = Counter()
+        self._lock = threading.RLock()
+        self._inflight = {}
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_time = stale_time
+        self.ttl_policy = ttl_policy
+        self._refresh_executor = None
+
+        # 共享目录同时承担磁盘层，多个进程通过它发布和读取同一份快照
+        shared_dir = shared_dir or os.environ.get("STOCKVIEW_SHARED_CACHE_DIR")
+        disk_dir = disk_dir or os.environ.get("STOCKVIEW_CACHE_DIR")
+        if shared_dir:
+            self.disk = SharedSnapshotCache(shared_dir)
+        elif disk_dir:
+            self.disk = DiskCache(disk_dir)
+        else:
+            self.disk = None
+        wrappers.add(self)
 
     def __getattr__(self, name):
         method = getattr(self.obj, name)
+        if not callable(method):
+            return method
 
-        def cached_method(*args, **kwargs):
+        def lookup(*args, **kwargs):
             key = (name, args, tuple(kwargs.items()))  # 创建缓存键
             current_time = time.time()
+            metrics.record_call("akshare", name)
 
-            # 检查缓存是否存在且未过期
-            if key in self.cache:
-                cached_result, timestamp = self.cache[key]
-                if current_time - timestamp < self.cache_time:
-                    logger.debug(f"缓存命中: {name}")
-                    return cached_result
+            # 检查缓存是否存在且未过期，同一个键同时只允许一个上游请求
+            with self._lock:
+                entry = self.cache.get(key)
+                if entry is not None:
+                    if entry.fresh(current_time):
+                        self.cache.move_to_end(key)
+                        logger.debug(f"缓存命中: {name}")
+                        return entry.value
+                    if not self._usable(entry, current_time):
+                        self._remove(key)
+                        entry = None
 
-            # 如果缓存不存在或过期，调用方法并缓存结果
-            logger.debug(f"缓存未命中, 正在调用方法 {name} {args} {kwargs}")
-            result = method(*args, **kwargs)
-            self.cache[key] = (result, current_time)
-            return result
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = Future()
+                    self._inflight[key] = future
+
+            if entry is None and leader:
+                entry = self._load_from_disk(key, name, current_time)
+                if entry is not None and entry.fresh(current_time):
+                    metrics.record("akshare", name, "disk_hits")
+                    self._resolve(key, future, entry.value)
+                    return entry.value
+
+            if entry is not None and self.stale_while_revalidate:
+                # 先返回过期数据，由后台线程刷新
+                if leader:
+                    self._executor().submit(
+                        self._refresh, key, name, method, args, kwargs, future, entry
+                    )
+                logger.debug(f"返回过期缓存并在后台刷新: {name}")
+                metrics.record("akshare", name, "stale")
+                return entry.value
+
+            if not leader:
+                logger.debug(f"等待进行中的请求: {name} {args} {kwargs}")
+                metrics.record("akshare", name, "coalesced")
+                return future.result()
+
+            metrics.record("akshare", name, "misses")
+            return self._refresh(key, name, method, args, kwargs, future, entry)
+
+        def cached_method(*args, **kwargs):
+            return shared_view(lookup(*args, **kwargs))
 
         return cached_method
 
-    def clear_cache(self):
-        self.cache.clear()  # 清空缓存
-        logger.info("缓存已清空")
+    def _refresh(self, key, name, method, args, kwargs, future, fallback=None):
+        """调用上游并写入缓存；失败时如果还有可用的旧值则继续返回旧值。"""
+        current_time = time.time()
+        try:
+            with self._disk_lock(key):
+                # 持锁后重新检查磁盘，其他进程可能已经发布了新结果
+                locked_time = time.time()
+                published = self._load_from_disk(key, name, locked_time, fresh_only=True)
+                if published is not None:
+                    result = published.value
+                else:
+                    result = self._fetch(key, name, method, args, kwargs, locked_time)
+        except Exception as e:
+            if fallback is None or not self._usable(fallback, current_time):
+                logger.error(f"调用 {name} 失败：{str(e)}")
+                self._reject(key, future, e)
+                raise
+            age = current_time - fallback.timestamp
+            logger.warning(f"调用 {name} 失败，继续使用 {age:.0f} 秒前的数据：{str(e)}")
+            result = fallback.value
+        except BaseException as e:
+            self._reject(key, future, e)
+            raise
+        self._resolve(key, future, result)
+        return result
+
+    def _fetch(self, key, name, method, args, kwargs, current_time):
+        # 如果缓存不存在或过期，调用方法并缓存结果
+        logger.debug(f"缓存未命中, 正在调用方法 {name} {args} {kwargs}")
+        started = metrics.start_call("akshare", name)
+        try:
+            result = method(*args, **kwargs)
+        except BaseException:
+            metrics.finish_call("akshare", name, started, error=True)
+            raise
+        size = estimate_size(result)
+        metrics.finish_call("akshare", name, started, result, size=size)
+        ttl = self.ttl_for(name, current_time)
+        self._store(key, name, result, current_time, ttl, size=size)
+        self._save_to_disk(key, name, result, current_time, ttl)
+        return result
+
+    def _disk_lock(self, key):
+        if self.disk is None:
+            return nullcontext()
+        return self.disk.lock(key)
+
+    def _resolve(self, key, future, result):
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+
+    def _reject(self, key, future, error):
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_exception(error)
+
+    def _usable(self, entry, current_time):
+        # 过期但仍在 stale_time 内的条目可以作为旧值返回
+        return current_time - entry.timestamp < entry.ttl + self.stale_time
+
+    def _executor(self):
+        with self._lock:
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(
+                    max_workers=4, thread_name_prefix="akcache-refresh"
+                )
+            return self._refresh_executor
+
+    def _load_from_disk(self, key, name, current_time, fresh_only=False):
+        if self.disk is None:
+            return None
+        stale_time = 0 if fresh_only else self.stale_time
+        loaded = self.disk.load(key, now=current_time, stale_time=stale_time)
+        if loaded is None:
+            return None
+        result, meta = loaded
+        if fresh_only and current_time - meta["fetched_at"] >= meta["ttl"]:
+            return None
+        self._store(key, name, result, meta["fetched_at"], meta["ttl"])
+        return CacheEntry(name, result, meta["fetched_at"], 0, meta["ttl"])
+
+    def _save_to_disk(self, key, name, result, fetched_at, ttl):
+        if self.disk is None:
+            return
+        try:
+            self.disk.save(key, name, result, fetched_at, ttl)
+        except Exception as e:
+            logger.warning(f"写入磁盘缓存 {name} 失败：{str(e)}")
+        try:
+            self.disk.purge_if_due(stale_time=self.stale_time)
+        except Exception as e:
+            logger.warning(f"清理磁盘缓存失败：{str(e)}")
+
+    def ttl_for(self, name, current_time=None):
+        """按 ttl_policy 计算某个函数结果的 TTL，未配置策略时使用 cache_time。"""
+        if self.ttl_policy is None:
+            return self.cache_time
+        now = datetime.fromtimestamp(current_time or time.time(), timezone.utc)
+        return self.ttl_policy(name, self.cache_time, now=now)
 
+    def _store(self, key, name, result, timestamp, ttl, size=None):
+        size = estimate_size(result) if size is None else size
+        if size > self.max_bytes:
+            logger.warning(
+                f"{name} 结果大小 {size} 字节超过缓存上限 {self.max_bytes}，不缓存"
+            )
+            return
 
-# 示例使用
+        with self._lock:
+            if key in self.cache:
+                self._remove(key)
+            self.cache[key] = CacheEntry(name, result, timestamp, size, ttl)
+            self.total_bytes += size
+            self._function_counts[name] += 1
+            self.purge_expired()
+            self._evict(name)
+
+    def _remove(self, key):
+        entry = self.cache.pop(key)
+        self.total_bytes -= entry.size
+        self._function_counts[entry.name] -= 1
+        if self._function_counts[entry.name] <= 0:
+            del self._function_counts[entry.name]
+        return entry
+
+    def _evict(self, name):
+        # 先按单函数上限淘汰该函数最久未使用的条目
+        limit = self.function_limits.get(name)
+        if limit is not None:
+            while self._function_counts[name] > limit:
+                oldest = next(k for k, e in self.cache.items() if e.name == name)
+                logger.debug(f"超过 {name} 的条目上限 {limit}，淘汰 {oldest}")
+                self._remove(oldest)
+
+        # 再按全局条目数和字节数淘汰最久未使用的条目
+        while self.cache and (
+            len(self.cache) > self.max_entries or self.total_bytes > self.max_bytes
+        ):
+            oldest = next(iter(self.cache))
+            logger.debug(f"缓存容量已满，淘汰 {oldest}")
+            self._remove(oldest)
+
+    def purge_expired(self):
+        """删除所有已过期的条目，返回删除数量。"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                key
+                for key, entry in self.cache.items()
+                if not self._usable(entry, now)
+            ]
+            for key in expired:
+                self._remove(key)
+        if expired:
+            logger.debug(f"清理过期缓存 {len(expired)} 条")
+        return len(expired)
+
+    def entry_age(self, name, *args, **kwargs):
+        """返回某次调用结果距离抓取时的秒数，没有缓存时返回 None。"""
+        key = (name, args, tuple(kwargs.items()))
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            return time.time() - entry.timestamp
+
+    def entry_overdue(self, name, *args, **kwargs):
+        """
+        返回某次调用结果超过自身 TTL 的秒数（未过期时为负数），没有缓存时返回 None。
+
+        休市期间 TTL 策略会把行情冻结到下一次开盘，用它判断数据是否真的陈旧，
+        而不是直接比较 entry_age 和 cache_time。
+        """
+        key = (name, args, tuple(kwargs.items()))
+        with self._lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            return time.time() - entry.timestamp - entry.ttl
+
+    def cache_info(self):
+        """返回当前缓存的条目数、字节数以及各函数的条目数。"""
+        with self._lock:
+            return {
+                "entries": len(self.cache),
+                "bytes": self.total_bytes,
+                "functions": dict(self._function_counts),
+            }
+
+    def clear_cache(self):
+        with self._lock:
+            self.cache.clear()  # 清空缓存
+            self.total_bytes = 0
+            self._function_counts.clear()
+        if self.disk is not None:
+            self.disk.clear()
+        logger.info("缓存已清空")
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+
+from contextlib import nullcontext
+
+import pandas as pd
+
+from stockview.log import logger
+
+
+def key_digest(key):
+    """把缓存键转换为稳定的文件名。"""
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+
+def atomic_write(path, writer):
+    """先写临时文件再替换，避免其他进程读到写了一半的文件。"""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        writer(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+class DiskCache:
+    """
+    CacheWrapper 的本地持久化层。
+
+    每个缓存键对应一个数据文件和一个元数据文件:
+    - DataFrame 写成 Parquet，其他对象（或 Parquet 无法表示的列）退回 pickle；
+    - 元数据 JSON 记录函数名、参数、抓取时间和 TTL，读取时先看元数据，
+      只有未过期时才加载数据文件。
+
+    目录可以被多个页面、多个 CacheWrapper 实例共享，容器重启后仍然有效。
+    """
+
+    frame_format = "parquet"
+    suffixes = {"parquet": "parquet", "pickle": "pkl"}
+    purge_interval = 3600  # 两次清理过期文件之间的最短间隔（秒）
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+
+    def lock(self, key):
+        """单进程场景不需要跨进程锁，子类可以覆盖。"""
+        return nullcontext()
+
+    def _meta_path(self, digest):
+        return self.directory / f"{digest}.json"
+
+    def _data_path(self, digest, fmt):
+        return self.directory / f"{digest}.{self.suffixes[fmt]}"
+
+    def _write_frame(self, path, frame):
+        frame.to_parquet(path)
+
+    def _read_frame(self, path):
+        return pd.read_parquet(path)
+
+    def read_meta(self, key):
+        meta_path = self._meta_path(key_digest(key))
+        try:
+            with meta_path.open("r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取缓存元数据 {meta_path} 失败：{str(e)}")
+            return None
+
+    def load(self, key, now=None, stale_time=0):
+        """
+        返回 (value, meta)；不存在、读取失败或过期超过 stale_time 秒时返回 None。
+
+        是否仍在 TTL 内由调用方根据 meta["fetched_at"] 判断。
+        """
+        meta = self.read_meta(key)
+        if meta is None:
+            return None
+        now = time.time() if now is None else now
+        if now >= meta["fetched_at"] + meta["ttl"] + stale_time:
+            return None
+
+        data_path = self._data_path(key_digest(key), meta["format"])
+        try:
+            if meta["format"] == self.frame_format:
+                value = self._read_frame(data_path)
+            else:
+                with data_path.open("rb") as file:
+                    value = pickle.load(file)
+        except Exception as e:
+            logger.warning(f"读取磁盘缓存 {data_path} 失败：{str(e)}")
+            return None
+        logger.debug(f"磁盘缓存命中: {meta['function']}")
+        return value, meta
+
+    def save(self, key, name, value, fetched_at, ttl):
+        digest = key_digest(key)
+        fmt = "pickle"
+        if isinstance(value, pd.DataFrame):
+            fmt = self.frame_format
+            data_path = self._data_path(digest, fmt)
+            try:
+                atomic_write(data_path, lambda path: self._write_frame(path, value))
+            except Exception as e:
+                logger.debug(f"{name} 无法写成 {fmt}，改用 pickle：{str(e)}")
+                fmt = "pickle"
+        if fmt == "pickle":
+            data_path = self._data_path(digest, fmt)
+            atomic_write(
+                data_path,
+                lambda path: path.write_bytes(
+                    pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+                ),
+            )
+
+        _, args, kwargs = key
+        meta = {
+            "function": name,
+            "args": repr(args),
+            "kwargs": repr(kwargs),
+            "fetched_at": fetched_at,
+            "ttl": ttl,
+            "format": fmt,
+            "rows": len(value) if isinstance(value, pd.DataFrame) else None,
+        }
+        atomic_write(
+            self._meta_path(digest),
+            lambda path: path.write_text(
+                json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+            ),
+        )
+
+    def purge_if_due(self, now=None, stale_time=0):
+        """距离上次清理超过 purge_interval 时清理一次过期文件，写入缓存时调用。"""
+        now = time.time() if now is None else now
+        with self._purge_lock:
+            if now - self._last_purge < self.purge_interval:
+                return 0
+            self._last_purge = now
+        return self.purge_expired(now=now, stale_time=stale_time)
+
+    def purge_expired(self, now=None, stale_time=0):
+        """删除过期超过 stale_time 秒（不能再作为旧值返回）的缓存文件，返回删除的条目数。"""
+        now = time.time() if now is None else now
+        removed = 0
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                with meta_path.open("r", encoding="utf-8") as file:
+                    meta = json.load(file)
+            except (OSError, ValueError):
+                continue
+            if now < meta["fetched_at"] + meta["ttl"] + stale_time:
+                continue
+            data_path = self._data_path(meta_path.stem, meta["format"])
+            data_path.unlink(missing_ok=True)
+            meta_path.unlink(missing_ok=True)
+            removed += 1
+        if removed:
+            logger.info(f"清理过期磁盘缓存 {removed} 条")
+        return removed
+
+    def clear(self):
+        for path in self.directory.iterdir():
+            if path.suffix in (".json", *(f".{s}" for s in self.suffixes.values())):
+                path.unlink(missing_ok=True)
@@ -0,0 +1,226 @@
+import importlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from stockview.akcache.disk import atomic_write, key_digest
+from stockview.akcache.policy import akshare_ttl_policy
+from stockview.akcache.replay import resolve_backend
+from stockview.helpers import market_time_helper
+from stockview.log import logger
+
+
+def _to_timestamp(value):
+    return pd.Timestamp(value).normalize()
+
+
+def _to_akshare_date(value):
+    return value.strftime("%Y%m%d")
+
+
+class HistoryStore:
+    """
+    日线历史的增量存储。
+
+    按 (函数名, symbol, 其他参数) 保存已经抓取的历史，记录已覆盖的日期区间:
+    - 请求区间早于已覆盖区间时只补抓缺失的头部；
+    - 请求区间晚于已覆盖区间，或尾部已过 TTL 时，从最后一根已存 K 线开始补抓尾部
+      （包含最后一天，以便覆盖盘中未完成的 K 线）；
+    - 合并后按日期去重，任意 start_date/end_date 都从本地切片返回。
+
+    directory（默认 STOCKVIEW_CACHE_DIR/history）不为空时，历史会以 Parquet 持久化。
+    """
+
+    def __init__(
+        self,
+        source=None,
+        directory=None,
+        date_column="日期",
+        default_ttl=180,
+        ttl_policy=akshare_ttl_policy,
+    ):
+        self._source = source
+        self.date_column = date_column
+        self.default_ttl = default_ttl
+        self.ttl_policy = ttl_policy
+        self._series = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+        if directory is None and os.environ.get("STOCKVIEW_CACHE_DIR"):
+            directory = Path(os.environ["STOCKVIEW_CACHE_DIR"]) / "history"
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def source(self):
+        if self._source is None:
+            self._source = resolve_backend(importlib.import_module("akshare"))
+        return self._source
+
+    def get(self, name, symbol, start_date, end_date, **kwargs):
+        """返回 [start_date, end_date] 区间的历史，只向上游请求缺失部分。"""
+        key = (name, symbol, tuple(sorted(kwargs.items())))
+        start = _to_timestamp(start_date)
+        end = _to_timestamp(end_date)
+
+        with self._key_lock(key):
+            series = self._series.get(key)
+            if series is None:
+                series = self._load(key)
+            series = self._update(key, series, name, symbol, start, end, kwargs)
+            self._series[key] = series
+
+        frame = series["frame"]
+        dates = frame[self.date_column]
+        return frame[(dates >= start) & (dates <= end)].reset_index(drop=True)
+
+    def _update(self, key, series, name, symbol, start, end, kwargs):
+        now = time.time()
+        today = pd.Timestamp(datetime.now(market_time_helper.tz).date())
+
+        if series is None:
+            frame = self._fetch(name, symbol, start, end, kwargs)
+            series = {"frame": frame, "start": start, "end": end, "checked_at": now}
+            self._save(key, series)
+            return series
+
+        parts = [series["frame"]]
+        covered_start, covered_end = series["start"], series["end"]
+        try:
+            if start < covered_start:
+                head_end = covered_start - pd.Timedelta(days=1)
+                parts.insert(
+                    0, self._fetch(name, symbol, start, head_end, kwargs, series["frame"])
+                )
+                covered_start = start
+
+            # 尾部的有效期按检查时刻的策略计算：盘中检查的尾部在收盘后也要重新抓取
+            ttl = self._ttl(name, at=series["checked_at"])
+            tail_open = covered_end >= today
+            if end > covered_end or (tail_open and now - series["checked_at"] >= ttl):
+                frame = series["frame"]
+                tail_start = (
+                    frame[self.date_column].iloc[-1] if not frame.empty else covered_start
+                )
+                parts.append(
+                    self._fetch(
+                        name, symbol, tail_start, max(end, covered_end), kwargs, frame
+                    )
+                )
+                covered_end = max(end, covered_end)
+                series["checked_at"] = now
+        except Exception as e:
+            logger.warning(f"增量获取 {name} {symbol} 失败，使用已有历史：{str(e)}")
+            return series
+
+        if len(parts) == 1:
+            return series
+
+        non_empty = [part for part in parts if not part.empty] or parts[:1]
+        frame = (
+            pd.concat(non_empty, ignore_index=True)
+            .drop_duplicates(subset=self.date_column, keep="last")
+            .sort_values(self.date_column)
+            .reset_index(drop=True)
+        )
+        series = {
+            "frame": frame,
+            "start": covered_start,
+            "end": covered_end,
+            "checked_at": series["checked_at"],
+        }
+        self._save(key, series)
+        return series
+
+    def _fetch(self, name, symbol, start, end, kwargs, like=None):
+        """抓取 [start, end]；区间内没有数据时返回与 like 同列（至少含日期列）的空表。"""
+        logger.info(
+            f"增量获取 {name} {symbol} {_to_akshare_date(start)}-{_to_akshare_date(end)}"
+        )
+        frame = getattr(self.source, name)(
+            symbol=symbol,
+            start_date=_to_akshare_date(start),
+            end_date=_to_akshare_date(end),
+            **kwargs,
+        )
+        if frame.empty:
+            # 空区间时 akshare 可能返回没有任何列的空表
+            columns = list(like.columns) if like is not None else []
+            if self.date_column not in columns:
+                columns.insert(0, self.date_column)
+            frame = pd.DataFrame(columns=columns)
+        frame = frame.copy()
+        frame[self.date_column] = pd.to_datetime(frame[self.date_column])
+        return frame.sort_values(self.date_column).reset_index(drop=True)
+
+    def _ttl(self, name, at=None):
+        """at（时间戳）时刻抓取的数据的 TTL。"""
+        if self.ttl_policy is None:
+            return self.default_ttl
+        now = datetime.fromtimestamp(at, market_time_helper.tz) if at is not None else None
+        return self.ttl_policy(name, self.default_ttl, now=now)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _paths(self, key):
+        digest = key_digest(key)
+        return self.directory / f"{digest}.parquet", self.directory / f"{digest}.json"
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        data_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            frame = pd.read_parquet(data_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"读取历史缓存 {data_path} 失败：{str(e)}")
+            return None
+        return {
+            "frame": frame,
+            "start": pd.Timestamp(meta["start"]),
+            "end": pd.Timestamp(meta["end"]),
+            "checked_at": meta["checked_at"],
+        }
+
+    def _save(self, key, series):
+        if self.directory is None:
+            return
+        data_path, meta_path = self._paths(key)
+        meta = {
+            "function": key[0],
+            "symbol": key[1],
+            "kwargs": repr(key[2]),
+            "start": series["start"].isoformat(),
+            "end": series["end"].isoformat(),
+            "checked_at": series["checked_at"],
+            "rows": len(series["frame"]),
+        }
+        try:
+            atomic_write(data_path, lambda path: series["frame"].to_parquet(path))
+            atomic_write(
+                meta_path,
+                lambda path: path.write_text(
+                    json.dumps(meta, ensure_ascii=False), encoding="utf-8"
+                ),
+            )
+        except Exception as e:
+            logger.warning(f"写入历史缓存 {data_path} 失败：{str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+history_store = HistoryStore()
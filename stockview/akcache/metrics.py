@@ -0,0 +1,229 @@
+import functools
+import sys
+import threading
+import time
+from collections import defaultdict
+
+import pandas as pd
+
+# 上游调用耗时直方图的桶边界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def estimate_size(value):
+    """估算缓存对象占用的字节数，DataFrame/Series 按 memory_usage(deep=True) 计算。"""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+def payload_rows(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+    return 0
+
+
+class FunctionStats:
+    def __init__(self):
+        self.calls = 0
+        self.misses = 0
+        self.errors = 0
+        self.stale = 0
+        self.coalesced = 0
+        self.disk_hits = 0
+        self.inflight = 0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.latency_count = 0
+        self.last_rows = 0
+        self.last_bytes = 0
+        self.total_rows = 0
+        self.total_bytes = 0
+
+    @property
+    def hits(self):
+        # 每次调用恰好归入 命中/未命中/过期/合并等待/磁盘命中 之一
+        return self.calls - self.misses - self.stale - self.coalesced - self.disk_hits
+
+
+class CacheMetrics:
+    """
+    按 (layer, function) 统计缓存命中、未命中、错误、进行中的请求，
+    以及上游调用耗时直方图和返回数据的行数/字节数。
+
+    layer 为 "akshare"（CacheWrapper 包装的上游调用）或 "st_cache"（st.cache_data 辅助函数）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(FunctionStats)
+
+    def record_call(self, layer, name):
+        with self._lock:
+            self._stats[(layer, name)].calls += 1
+
+    def record(self, layer, name, outcome):
+        """outcome 为 misses / stale / coalesced / disk_hits 之一。"""
+        with self._lock:
+            stats = self._stats[(layer, name)]
+            setattr(stats, outcome, getattr(stats, outcome) + 1)
+
+    def start_call(self, layer, name):
+        """开始一次上游调用（包括后台刷新），返回计时起点。"""
+        with self._lock:
+            self._stats[(layer, name)].inflight += 1
+        return time.perf_counter()
+
+    def finish_call(self, layer, name, started, result=None, error=False, size=None):
+        """结束一次上游调用，记录耗时、错误和返回数据大小。"""
+        elapsed = time.perf_counter() - started
+        rows = payload_rows(result) if not error else 0
+        if size is None:
+            size = estimate_size(result) if not error else 0
+        with self._lock:
+            stats = self._stats[(layer, name)]
+            stats.inflight -= 1
+            if error:
+                stats.errors += 1
+            bucket = next(
+                (i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound),
+                len(LATENCY_BUCKETS),
+            )
+            stats.latency_buckets[bucket] += 1
+            stats.latency_sum += elapsed
+            stats.latency_count += 1
+            if not error:
+                stats.last_rows = rows
+                stats.last_bytes = size
+                stats.total_rows += rows
+                stats.total_bytes += size
+        return elapsed
+
+    def snapshot(self):
+        """返回每个函数一行的统计表。"""
+        with self._lock:
+            rows = [
+                {
+                    "layer": layer,
+                    "function": name,
+                    "calls": stats.calls,
+                    "hits": stats.hits,
+                    "misses": stats.misses,
+                    "stale": stats.stale,
+                    "coalesced": stats.coalesced,
+                    "disk_hits": stats.disk_hits,
+                    "errors": stats.errors,
+                    "inflight": stats.inflight,
+                    "avg_latency": (
+                        stats.latency_sum / stats.latency_count
+                        if stats.latency_count
+                        else None
+                    ),
+                    "last_rows": stats.last_rows,
+                    "last_bytes": stats.last_bytes,
+                }
+                for (layer, name), stats in sorted(self._stats.items())
+            ]
+        return pd.DataFrame(rows)
+
+    def render_prometheus(self):
+        """输出 Prometheus 文本格式的指标。"""
+        lines = []
+        counters = [
+            ("calls", "调用次数"),
+            ("hits", "缓存命中次数"),
+            ("misses", "缓存未命中次数"),
+            ("stale", "返回过期数据次数"),
+            ("coalesced", "等待进行中请求的次数"),
+            ("disk_hits", "磁盘缓存命中次数"),
+            ("errors", "上游调用失败次数"),
+        ]
+        with self._lock:
+            items = sorted(self._stats.items())
+            for field, help_text in counters:
+                metric = f"stockview_cache_{field}_total"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for (layer, name), stats in items:
+                    lines.append(
+                        f'{metric}{{layer="{layer}",function="{name}"}} {getattr(stats, field)}'
+                    )
+
+            gauges = [
+                ("inflight", "stockview_cache_inflight", "进行中的上游调用"),
+                ("last_rows", "stockview_payload_rows", "最近一次返回的行数"),
+                ("last_bytes", "stockview_payload_bytes", "最近一次返回的字节数"),
+            ]
+            for field, metric, help_text in gauges:
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+                for (layer, name), stats in items:
+                    lines.append(
+                        f'{metric}{{layer="{layer}",function="{name}"}} {getattr(stats, field)}'
+                    )
+
+            metric = "stockview_upstream_latency_seconds"
+            lines.append(f"# HELP {metric} 上游调用耗时")
+            lines.append(f"# TYPE {metric} histogram")
+            for (layer, name), stats in items:
+                labels = f'layer="{layer}",function="{name}"'
+                cumulative = 0
+                for bound, count in zip(
+                    list(LATENCY_BUCKETS) + ["+Inf"], stats.latency_buckets
+                ):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{labels}}} {stats.latency_sum:.6f}")
+                lines.append(f"{metric}_count{{{labels}}} {stats.latency_count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+metrics = CacheMetrics()
+
+
+def tracked_cache_data(**cache_kwargs):
+    """
+    与 st.cache_data 用法相同，额外记录调用次数和实际执行（未命中）次数。
+
+    外层统计每次调用，内层只有 st.cache_data 未命中时才会执行，两者之差就是命中次数。
+    """
+    import streamlit as st
+
+    def decorator(func):
+        name = func.__name__
+
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            metrics.record("st_cache", name, "misses")
+            started = metrics.start_call("st_cache", name)
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                metrics.finish_call("st_cache", name, started, error=True)
+                raise
+            metrics.finish_call("st_cache", name, started, result)
+            return result
+
+        cached = st.cache_data(**cache_kwargs)(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics.record_call("st_cache", name)
+            return cached(*args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+
+    return decorator
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from stockview.helpers import market_time_helper
+
+# TTL 分类
+INTRADAY = "intraday"  # 盘中实时行情：交易时段内短 TTL，休市期间冻结到下一次开盘
+END_OF_DAY = "end_of_day"  # 日线历史：盘中定期刷新当日 K 线，休市期间有效到下一次开盘
+STATIC = "static"  # 基本不会变化的数据
+CALENDAR = "calendar"  # 交易日历：每天更新一次
+
+# akshare 函数名 -> TTL 分类，未列出的函数使用 CacheWrapper 的 cache_time
+AKSHARE_TTL_POLICIES = {
+    "stock_zh_a_spot_em": INTRADAY,
+    "stock_zh_index_spot_em": INTRADAY,
+    "stock_zh_a_minute": INTRADAY,
+    "futures_zh_spot": INTRADAY,
+    "option_value_analysis_em": INTRADAY,
+    "index_zh_a_hist": END_OF_DAY,
+    "stock_zh_index_daily_em": END_OF_DAY,
+    "stock_index_pe_lg": END_OF_DAY,
+    "futures_main_sina": END_OF_DAY,
+    "tool_trade_date_hist_sina": CALENDAR,
+}
+
+
+class TtlPolicy:
+    """
+    按函数名和交易时间计算缓存 TTL（秒）。
+
+    - INTRADAY: 连续竞价时段使用 default_ttl；午休冻结到 13:00，收盘后冻结到下一个交易日开盘；
+    - END_OF_DAY: 盘中每 intraday_history_ttl 秒刷新一次当日未完成的 K 线，
+      休市期间有效到下一次开盘（盘前、午休抓取的数据不会一直用到收盘）；
+    - STATIC / CALENDAR: 固定较长的 TTL。
+
+    收盘后 settle_minutes 分钟内数据源可能还在修正当日数据，这段时间统一使用 default_ttl。
+    """
+
+    def __init__(
+        self,
+        policies=None,
+        market_time=market_time_helper,
+        settle_minutes=30,
+        intraday_history_ttl=1800,
+        static_ttl=7 * 24 * 3600,
+        calendar_ttl=24 * 3600,
+    ):
+        self.policies = dict(AKSHARE_TTL_POLICIES if policies is None else policies)
+        self.market_time = market_time
+        self.settle = timedelta(minutes=settle_minutes)
+        self.intraday_history_ttl = intraday_history_ttl
+        self.static_ttl = static_ttl
+        self.calendar_ttl = calendar_ttl
+
+    def __call__(self, name, default_ttl, now=None):
+        now = (now or datetime.now(self.market_time.tz)).astimezone(self.market_time.tz)
+        policy = self.policies.get(name)
+
+        if policy == STATIC:
+            return self.static_ttl
+        if policy == CALENDAR:
+            return self.calendar_ttl
+        if policy not in (INTRADAY, END_OF_DAY):
+            return default_ttl
+
+        if self.market_time.in_trading_session(now) or self._settling(now):
+            if policy == END_OF_DAY:
+                return max(default_ttl, self.intraday_history_ttl)
+            return default_ttl
+
+        # 休市期间两类数据都有效到下一次开盘（含午后开盘）：END_OF_DAY 开盘后改用
+        # intraday_history_ttl 刷新当日 K 线，盘前、午休抓取的数据不会一直用到收盘
+        expires_at = self.market_time.next_market_open(now)
+        return max(default_ttl, (expires_at - now).total_seconds())
+
+    def _settling(self, now):
+        if not self.market_time.is_trading_day(now.date()):
+            return False
+        market_close_time = self.market_time._get_market_times(now)[3]
+        return market_close_time <= now < market_close_time + self.settle
+
+
+akshare_ttl_policy = TtlPolicy()
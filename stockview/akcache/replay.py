@@ -0,0 +1,139 @@
+import math
+import os
+import time
+
+import pandas as pd
+
+from stockview.akcache.disk import DiskCache
+from stockview.log import logger
+
+# 环境变量:
+#   STOCKVIEW_AK_MODE      live（默认）/ record / replay
+#   STOCKVIEW_AK_FIXTURES  fixture 目录，默认 fixtures/akshare
+#   STOCKVIEW_AK_LATENCY   回放时每次调用注入的延迟（秒）
+DEFAULT_FIXTURE_DIR = "fixtures/akshare"
+
+# 随调用日期变化的区间参数（HistoryStore 的头尾补抓都会传入与当天相关的日期）
+DATE_RANGE_KWARGS = ("start_date", "end_date")
+DATE_COLUMNS = ("日期", "date", "day", "trade_date")
+
+
+class FixtureNotFound(LookupError):
+    pass
+
+
+def fixture_key(name, args, kwargs):
+    """
+    日期区间参数不进入键：同一序列不同区间的调用共用一个 fixture。
+
+    录制时把各次结果合并成超集，回放时再按 start_date/end_date 切片，某一天录制的
+    fixture 在之后任何一天都能回放。
+    """
+    kwargs = {k: v for k, v in kwargs.items() if k not in DATE_RANGE_KWARGS}
+    return (name, tuple(args), tuple(sorted(kwargs.items())))
+
+
+def _date_column(value):
+    if not isinstance(value, pd.DataFrame):
+        return None
+    return next((column for column in DATE_COLUMNS if column in value.columns), None)
+
+
+def merge_recorded(previous, result):
+    """把同一 fixture 之前录制的行与本次结果合并，按日期去重，本次结果优先。"""
+    column = _date_column(result)
+    if column is None or _date_column(previous) != column or previous.empty:
+        return result
+    if result.empty:
+        return previous
+    merged = pd.concat([previous, result], ignore_index=True)
+    dates = pd.to_datetime(merged[column])
+    keep = ~dates.duplicated(keep="last")
+    return merged[keep].iloc[dates[keep].argsort(kind="stable")].reset_index(drop=True)
+
+
+def slice_range(value, kwargs):
+    """按调用的 start_date/end_date（含两端，按自然日比较）切出录制的超集。"""
+    column = _date_column(value)
+    if column is None or not any(k in kwargs for k in DATE_RANGE_KWARGS):
+        return value
+    days = pd.to_datetime(value[column]).dt.normalize()
+    keep = pd.Series(True, index=value.index)
+    if kwargs.get("start_date"):
+        keep &= days >= pd.Timestamp(kwargs["start_date"])
+    if kwargs.get("end_date"):
+        keep &= days <= pd.Timestamp(kwargs["end_date"])
+    return value[keep].reset_index(drop=True)
+
+
+class RecordingBackend:
+    """透传到真实的 akshare，同时把每次调用的参数和返回值写入 fixture 目录。"""
+
+    def __init__(self, obj, directory=DEFAULT_FIXTURE_DIR):
+        self.obj = obj
+        self.store = DiskCache(directory)
+
+    def __getattr__(self, name):
+        method = getattr(self.obj, name)
+        if not callable(method):
+            return method
+
+        def recorded_method(*args, **kwargs):
+            result = method(*args, **kwargs)
+            key = fixture_key(name, args, kwargs)
+            try:
+                recorded = result
+                previous = self.store.load(key, stale_time=math.inf)
+                if previous is not None:
+                    recorded = merge_recorded(previous[0], result)
+                self.store.save(key, name, recorded, time.time(), 0)
+            except Exception as e:
+                logger.warning(f"记录 {name} 的 fixture 失败：{str(e)}")
+            return result
+
+        return recorded_method
+
+
+class ReplayBackend:
+    """
+    从 fixture 目录回放 akshare 调用，不访问网络。
+
+    latency 为每次调用注入的固定延迟，用来模拟上游耗时，得到可复现的性能测试结果。
+    """
+
+    __version__ = "replay"
+
+    def __init__(self, directory=DEFAULT_FIXTURE_DIR, latency=0.0):
+        self.store = DiskCache(directory)
+        self.latency = latency
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        def replayed_method(*args, **kwargs):
+            if self.latency:
+                time.sleep(self.latency)
+            # fixture 不会过期
+            loaded = self.store.load(fixture_key(name, args, kwargs), stale_time=math.inf)
+            if loaded is None:
+                raise FixtureNotFound(f"没有 {name} {args} {kwargs} 的 fixture")
+            return slice_range(loaded[0], kwargs)
+
+        return replayed_method
+
+
+def resolve_backend(obj):
+    """按 STOCKVIEW_AK_MODE 返回真实对象、录制包装或回放对象。"""
+    mode = os.environ.get("STOCKVIEW_AK_MODE", "live")
+    directory = os.environ.get("STOCKVIEW_AK_FIXTURES", DEFAULT_FIXTURE_DIR)
+    if mode == "live":
+        return obj
+    if mode == "record":
+        logger.info(f"akshare 录制模式，fixture 目录 {directory}")
+        return RecordingBackend(obj, directory)
+    if mode == "replay":
+        latency = float(os.environ.get("STOCKVIEW_AK_LATENCY", "0"))
+        logger.info(f"akshare 回放模式，fixture 目录 {directory}，注入延迟 {latency} 秒")
+        return ReplayBackend(directory, latency)
+    raise ValueError(f"未知的 STOCKVIEW_AK_MODE: {mode}")
@@ -0,0 +1,99 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+from stockview.akcache.disk import DiskCache, key_digest
+from stockview.log import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，退化为进程内锁
+    fcntl = None
+
+
+class SharedSnapshotCache(DiskCache):
+    """
+    多个 Streamlit 进程共享的快照缓存。
+
+    在 DiskCache 的基础上:
+    - DataFrame 写成 Arrow IPC 文件，读取时通过 memory_map 映射，不需要 pickle 反序列化，
+      列数据直接从映射转换成 NumPy（会拷贝一次，得到可写的普通 DataFrame）；
+    - lock(key) 对每个缓存键加跨进程文件锁，CacheWrapper 在调用上游前持有该锁并
+      重新检查共享目录，第一个进程抓取并发布结果，其余进程直接读取。
+    """
+
+    frame_format = "arrow"
+    suffixes = {"arrow": "arrow", "pickle": "pkl"}
+
+    def __init__(self, directory):
+        super().__init__(directory)
+        self._thread_locks = {}
+        self._guard = threading.Lock()
+        if fcntl is None:
+            logger.warning("当前平台不支持 fcntl，共享缓存只能在进程内加锁")
+
+    @contextmanager
+    def lock(self, key):
+        digest = key_digest(key)
+        # flock 只在进程间互斥，同一进程的线程还需要一把普通锁
+        with self._guard:
+            thread_lock = self._thread_locks.setdefault(digest, threading.Lock())
+        with thread_lock:
+            if fcntl is None:
+                yield
+                return
+            lock_path = self.directory / f"{digest}.lock"
+            with lock_path.open("a+") as file:
+                fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+    def purge_expired(self, now=None, stale_time=0):
+        removed = super().purge_expired(now=now, stale_time=stale_time)
+        self._purge_locks(time.time() if now is None else now)
+        return removed
+
+    def _purge_locks(self, now):
+        """
+        删除对应条目已不存在、且超过 purge_interval 未使用的锁文件。
+
+        只删除当前能以非阻塞方式拿到的锁；极少数情况下另一个进程恰好在删除前打开了
+        旧文件，最坏结果是两个进程各抓取一次上游，数据文件仍由 atomic_write 保证完整。
+        """
+        removed = 0
+        for lock_path in self.directory.glob("*.lock"):
+            if self._meta_path(lock_path.stem).exists():
+                continue
+            try:
+                if now - lock_path.stat().st_mtime < self.purge_interval:
+                    continue
+                with lock_path.open("a+") as file:
+                    if fcntl is not None:
+                        try:
+                            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        except BlockingIOError:
+                            continue
+                    lock_path.unlink(missing_ok=True)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"清理过期锁文件 {removed} 个")
+        return removed
+
+    def _write_frame(self, path, frame):
+        table = pa.Table.from_pandas(frame, preserve_index=True)
+        with pa.OSFile(str(path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    def _read_frame(self, path):
+        # to_pandas 把列拷贝成普通 NumPy 数组：下游会修改返回的 DataFrame，而且映射在
+        # 返回前关闭，不能让 DataFrame 引用映射的内存
+        with pa.memory_map(str(path), "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+            return table.to_pandas()
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from stockview.log import logger
+
+# 15 分钟 K 线的结束时刻，一个交易日 16 根
+BAR_TIMES: tuple[str, ...] = (
+    "09:45", "10:00", "10:15", "10:30", "10:45", "11:00", "11:15", "11:30",
+    "13:15", "13:30", "13:45", "14:00", "14:15", "14:30", "14:45", "15:00",
+)  # fmt: skip
+BARS_PER_DAY = len(BAR_TIMES)
+# 开盘后的交易分钟数 -> 累计比例的插值节点（0, 15, ..., 240）
+BAR_KNOTS = np.arange(BARS_PER_DAY + 1) * 15.0
+
+# 交易日类型
+NORMAL = "normal"
+MONTH_END = "month_end"  # 当月最后一个交易日
+PRE_HOLIDAY = "pre_holiday"  # 长假（不只是周末）前的最后一个交易日
+
+
+def bar_matrix(bars: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    把 15 分钟成交额整理成 (天数, 16) 的矩阵，按 K 线时刻对齐。
+
+    bars 需要 day（K 线结束时间）和 amount 两列。不在 BAR_TIMES 中的 K 线被忽略，
+    缺少任意一根 K 线或全天成交额为 0 的交易日被剔除。
+
+    返回:
+        (dates, matrix): dates 为 datetime64[D] 数组，与 matrix 的行对应。
+    """
+    day = pd.to_datetime(bars["day"])
+    slots = pd.Index(BAR_TIMES).get_indexer(day.dt.strftime("%H:%M"))
+    keep = slots >= 0
+    codes, dates = pd.factorize(day[keep].dt.normalize(), sort=True)
+
+    matrix = np.full((len(dates), BARS_PER_DAY), np.nan)
+    matrix[codes, slots[keep]] = pd.to_numeric(bars["amount"][keep]).to_numpy(float)
+
+    complete = ~np.isnan(matrix).any(axis=1) & (np.nansum(matrix, axis=1) > 0)
+    if not complete.all():
+        dropped = [f"{d:%Y-%m-%d}" for d in dates[~complete]]
+        logger.warning(f"以下交易日分时数据不完整，已剔除：{', '.join(dropped)}")
+    return dates[complete].to_numpy(dtype="datetime64[D]"), matrix[complete]
+
+
+@dataclass(frozen=True, eq=False)
+class AmountCurve:
+    """日内成交额分布：每根 15 分钟 K 线占全天的比例及其累计比例。"""
+
+    fractions: np.ndarray  # (16,)
+    days: int
+    cumulative: np.ndarray = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, "cumulative", np.concatenate(([0.0], np.cumsum(self.fractions)))
+        )
+
+    @classmethod
+    def from_matrix(cls, matrix: np.ndarray) -> "AmountCurve":
+        """由 (天数, 16) 的成交额矩阵计算平均日内分布。"""
+        shares = matrix / matrix.sum(axis=1, keepdims=True)
+        return cls(shares.mean(axis=0), len(matrix))
+
+    def fraction_at(self, minutes: float) -> float:
+        """开盘 minutes 分钟后累计成交额占全天的比例，K 线内部线性插值。"""
+        return float(np.interp(minutes, BAR_KNOTS, self.cumulative))
+
+
+def session_kinds(dates: np.ndarray, trade_dates: np.ndarray) -> np.ndarray:
+    """按交易日历判断每个交易日的类型：长假前、月末或普通交易日。"""
+    trade_dates = np.asarray(trade_dates, dtype="datetime64[D]")
+    dates = np.asarray(dates, dtype="datetime64[D]")
+    positions = np.searchsorted(trade_dates, dates, side="right")
+    has_next = positions < len(trade_dates)
+    next_dates = trade_dates[np.minimum(positions, len(trade_dates) - 1)]
+
+    gap = (next_dates - dates).astype(int)
+    weekday = (dates.astype(int) + 3) % 7  # 1970-01-01 是星期四
+    # 周五到下周一间隔 3 天属于正常周末
+    pre_holiday = has_next & ((gap > 3) | ((gap > 1) & (weekday != 4)))
+    month_end = has_next & (
+        next_dates.astype("datetime64[M]") != dates.astype("datetime64[M]")
+    )
+
+    kinds = np.full(len(dates), NORMAL, dtype=object)
+    kinds[month_end] = MONTH_END
+    kinds[pre_holiday] = PRE_HOLIDAY
+    return kinds
+
+
+@dataclass(frozen=True, eq=False)
+class AmountCurveProfiles:
+    """
+    按交易日类型区分的日内成交额分布。
+
+    - pre_holiday / month_end: 历史上同类交易日的平均分布；
+    - weekday: 普通交易日按星期几分别统计最近 weekday_days 天；
+    - recent: 最近 recent_days 个交易日，样本不足时的兜底。
+    """
+
+    recent: AmountCurve
+    weekday: dict[int, AmountCurve]
+    special: dict[str, AmountCurve]
+    trade_dates: np.ndarray
+
+    def for_day(self, day: date) -> AmountCurve:
+        kind = session_kinds(np.array([day], dtype="datetime64[D]"), self.trade_dates)[0]
+        if kind in self.special:
+            return self.special[kind]
+        return self.weekday.get(day.weekday(), self.recent)
+
+
+def build_amount_profiles(
+    bars: pd.DataFrame,
+    trade_dates,
+    recent_days=5,
+    weekday_days=8,
+    min_days=3,
+    min_special_days=2,
+) -> AmountCurveProfiles:
+    """
+    由历史 15 分钟成交额构建各类交易日的分布。
+
+    分时数据通常只覆盖几个月，月末和长假前样本很少，因此单独使用 min_special_days；
+    样本不足的类型不单独建模，回退到星期分布或最近几天的分布。
+    """
+    dates, matrix = bar_matrix(bars)
+    if len(dates) == 0:
+        raise ValueError("没有完整的分时数据，无法计算成交额分布")
+
+    trade_dates = np.asarray(trade_dates, dtype="datetime64[D]")
+    kinds = session_kinds(dates, trade_dates)
+    weekdays = (dates.astype(int) + 3) % 7
+
+    special = {}
+    for kind in (PRE_HOLIDAY, MONTH_END):
+        rows = np.flatnonzero(kinds == kind)
+        if len(rows) >= min_special_days:
+            special[kind] = AmountCurve.from_matrix(matrix[rows])
+
+    weekday = {}
+    for day_of_week in range(5):
+        rows = np.flatnonzero((kinds == NORMAL) & (weekdays == day_of_week))
+        if len(rows) >= min_days:
+            weekday[day_of_week] = AmountCurve.from_matrix(matrix[rows[-weekday_days:]])
+
+    profiles = AmountCurveProfiles(
+        recent=AmountCurve.from_matrix(matrix[-recent_days:]),
+        weekday=weekday,
+        special=special,
+        trade_dates=trade_dates,
+    )
+    logger.info(
+        f"成交额分布：{len(dates)} 个完整交易日，星期分布 {sorted(weekday)}，"
+        f"特殊交易日 {sorted(special)}"
+    )
+    return profiles
@@ -20,10 +20,16 @@ def main() -> None:
 
     from stockview.charts.cybratio import render_cyb_ratio_page
     from stockview.congestion import render_congestion_page
+    from stockview.diagnostics import render_diagnostics_page
     from stockview.if_im_page import render_if_im_page
     from stockview.index_amount_compare import render_index_amount_compare_page
     from stockview.main import streamlit_app as render_market_dashboard
 
+    # 诊断页面不出现在侧边栏，通过 ?page=诊断 访问
+    if st.query_params.get("page") == "诊断":
+        render_diagnostics_page()
+        return
+
     st.sidebar.title("Stock Analysis")
     page = st.sidebar.radio(
         "选择功能",
@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from stockview.limits import compute_limit_stats
+from stockview.log import logger
+
+
+@dataclass(frozen=True)
+class MarketBreadth:
+    """一次 A 股实时快照上的全部市场宽度指标。"""
+
+    stock_count: int
+    median_change: float  # 中位数股票涨幅（%）
+    up_ratio: float  # 上涨股票占比（%），没有下跌股票时为 inf
+    limit_up_count: int
+    limit_down_count: int
+    near_limit_up_count: int
+    near_limit_down_count: int
+    broken_limit_count: int  # 炸板数量
+    crowdedness: float  # 前 top_percent% 成交量股票占总成交量比例（0-1）
+    top_weighted_change: float  # 前 top_percent% 成交额股票的市值加权涨幅（%）
+    top_avg_change: float  # 前 top_percent% 成交额股票的算数平均涨幅（%），剔除涨幅 >= 31%
+    top_stocks: pd.DataFrame  # 成交额前 top_n 的股票
+    top_avg_market_value: float  # 成交额前 top_n 股票平均市值（亿）
+    top_total_market_value: float  # 成交额前 top_n 股票总市值（亿）
+    change_quantiles: dict[float, float]  # 涨跌幅分位数（%）
+    crowdedness_by_cutoff: dict[float, float]  # 前 n% 成交量股票占比（0-1）
+
+    @classmethod
+    def empty(cls) -> "MarketBreadth":
+        return cls(0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, pd.DataFrame(), 0, 0, {}, {})
+
+
+# 一次计算的拥挤度截断（前 n% 成交量）和涨跌幅分位数
+CROWDEDNESS_CUTOFFS: tuple[float, ...] = (1, 5, 10)
+CHANGE_QUANTILES: tuple[float, ...] = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9)
+
+
+def float_column(spot: pd.DataFrame, column: str) -> np.ndarray:
+    return pd.to_numeric(spot[column], errors="coerce").to_numpy(dtype=float)
+
+
+def top_k_order(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    返回 values 中最大的 k 个元素的下标，按值降序排列，NaN 视为最小。
+
+    先用 np.argpartition 在 O(n) 内选出前 k 个，只对这 k 个排序；
+    值相同时按原始位置排列，与稳定的降序排序结果一致。
+    """
+    k = max(0, min(int(k), len(values)))
+    if k == 0:
+        return np.empty(0, dtype=np.intp)
+    keys = np.where(np.isnan(values), -np.inf, values)
+    if k < len(keys):
+        rows = np.argpartition(-keys, k - 1)[:k]
+    else:
+        rows = np.arange(len(keys))
+    return rows[np.lexsort((rows, -keys[rows]))]
+
+
+def top_shares(values: np.ndarray, percents) -> dict[float, float]:
+    """
+    一次选择计算多个前 n% 截断占总量的比例（0-1），NaN 按 0 计。
+
+    只对最大截断做一次部分选择，较小的截断取其累计和的前缀。
+    """
+    filled = np.nan_to_num(values, nan=0.0)
+    total = filled.sum()
+    counts = {p: int(len(filled) * (p / 100)) for p in percents}
+    if total == 0:
+        return {p: 0.0 for p in percents}
+    cumulative = np.cumsum(filled[top_k_order(filled, max(counts.values(), default=0))])
+    return {p: float(cumulative[k - 1] / total) if k else 0.0 for p, k in counts.items()}
+
+
+def select_quantiles(values: np.ndarray, quantiles) -> dict[float, float]:
+    """
+    用一次 np.partition 选出多个分位数，忽略 NaN。
+
+    分位数 q 取升序第 int(q * n) 个元素（q=0.5 即中位数位置 n // 2）。
+    """
+    valid = values[~np.isnan(values)]
+    if len(valid) == 0:
+        return {q: float("nan") for q in quantiles}
+    positions = {q: min(int(q * len(valid)), len(valid) - 1) for q in quantiles}
+    selected = np.partition(valid, sorted(set(positions.values())))
+    return {q: float(selected[pos]) for q, pos in positions.items()}
+
+
+def compute_market_breadth(
+    spot: pd.DataFrame, top_percent: float = 5, top_n: int = 10
+) -> MarketBreadth:
+    """
+    在一份 stock_zh_a_spot_em 快照上一次性计算所有宽度指标。
+
+    所有列先取成 NumPy 数组，不做全市场排序：分位数和前 n% 截断都用
+    np.partition/np.argpartition 选择，只对选出的少量股票排序。
+    """
+    if spot.empty:
+        logger.info("实时行情数据为空，无法计算市场宽度")
+        return MarketBreadth.empty()
+
+    change = float_column(spot, "涨跌幅")
+    volume = float_column(spot, "成交量")
+    amount = float_column(spot, "成交额")
+    market_value = float_column(spot, "总市值")
+    num_stocks = len(spot)
+    top_k = int(num_stocks * (top_percent / 100))
+
+    # 涨跌幅分位数（含中位数）
+    change_quantiles = select_quantiles(change, sorted({*CHANGE_QUANTILES, 0.5}))
+    median_change = change_quantiles[0.5]
+
+    # 涨跌比
+    up_stocks = int((change >= 0).sum())
+    down_stocks = int((change < 0).sum())
+    if down_stocks == 0:
+        logger.info("没有下跌的股票，涨跌比为无穷大")
+        up_ratio = float("inf")
+    else:
+        up_ratio = up_stocks / num_stocks * 100
+
+    # 涨跌停：按板块规则由昨收计算涨跌停价
+    limits = compute_limit_stats(spot)
+
+    # 成交量拥挤度：多个前 n% 截断一次计算
+    if np.nansum(volume) == 0:
+        logger.info("总成交量为0, 可能是盘前，无法计算拥挤度")
+    crowdedness_by_cutoff = top_shares(volume, sorted({*CROWDEDNESS_CUTOFFS, top_percent}))
+    crowdedness = crowdedness_by_cutoff[top_percent]
+
+    # 成交额前 top_k 的股票，算数平均剔除涨幅 >= 31%（及涨幅缺失）的股票后再取前 top_k，
+    # 因此多选出被剔除的数量
+    excluded = int((~(change < 31)).sum())
+    amount_order = top_k_order(amount, max(top_k + excluded, top_n))
+    top_rows = amount_order[:top_k]
+    top_weighted_change = float(
+        np.nansum(change[top_rows] * market_value[top_rows])
+        / np.nansum(market_value[top_rows])
+    )
+    capped_rows = amount_order[change[amount_order] < 31][:top_k]
+    top_avg_change = float(np.nanmean(change[capped_rows])) if len(capped_rows) else 0.0
+
+    leader_rows = amount_order[:top_n]
+    leader_values = market_value[leader_rows]
+    breadth = MarketBreadth(
+        stock_count=num_stocks,
+        median_change=median_change,
+        up_ratio=up_ratio,
+        limit_up_count=limits.limit_up,
+        limit_down_count=limits.limit_down,
+        near_limit_up_count=limits.near_limit_up,
+        near_limit_down_count=limits.near_limit_down,
+        broken_limit_count=limits.broken,
+        crowdedness=crowdedness,
+        top_weighted_change=top_weighted_change,
+        top_avg_change=top_avg_change,
+        top_stocks=spot.iloc[leader_rows],
+        top_avg_market_value=float(np.nanmean(leader_values) / 1e8),
+        top_total_market_value=float(np.nansum(leader_values) / 1e8),
+        change_quantiles=change_quantiles,
+        crowdedness_by_cutoff=crowdedness_by_cutoff,
+    )
+    logger.info(
+        f"市场宽度: 中位数涨幅 {median_change}, 上涨占比 {up_ratio:.2f}%, "
+        f"涨停 {limits.limit_up}, 跌停 {limits.limit_down}, 炸板 {limits.broken}, "
+        f"拥挤度 {crowdedness * 100:.2f}%"
+    )
+    return breadth
@@ -3,9 +3,10 @@ import akshare
 import pandas as pd
 import streamlit as st
 
-from stockview.akcache import CacheWrapper
+from stockview.akcache import CacheWrapper, akshare_ttl_policy
+from stockview.akcache.metrics import tracked_cache_data
 
-ak = CacheWrapper(akshare, cache_time=180)
+ak = CacheWrapper(akshare, cache_time=180, ttl_policy=akshare_ttl_policy)
 
 SYMBOL_SH = "sh000001"
 SYMBOL_SZ = "sz399001"
@@ -17,7 +18,7 @@ SYMBOL_CYB = "sz399006"
 #   date	    open	close	high	low	    amount	    amount
 # 0	1991-04-03	988.05	988.05	988.05	988.05	1	        1.000000e+04
 
-@st.cache_data(ttl=180)
+@tracked_cache_data(ttl=180)
 def build_cyb_ratio_dataframe(lookback_days: int = 250) -> pd.DataFrame:
     df_sh = ak.stock_zh_index_daily_em(SYMBOL_SH).tail(lookback_days).copy()
     df_sz = ak.stock_zh_index_daily_em(SYMBOL_SZ).tail(lookback_days).copy()
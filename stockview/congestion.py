@@ -4,10 +4,11 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from bs4 import BeautifulSoup
 import requests
+from stockview.akcache.metrics import tracked_cache_data
 
 
 # 数据获取函数
-@st.cache_data(ttl=3600)
+@tracked_cache_data(ttl=3600)
 def get_html_content(url):
     headers = {
         "User-Agent": (
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import pandas as pd
+import streamlit as st
+
+from stockview.akcache.akcache import wrappers
+from stockview.akcache.metrics import metrics
+
+
+def build_cache_usage() -> pd.DataFrame:
+    rows = []
+    for wrapper in list(wrappers):
+        info = wrapper.cache_info()
+        rows.append(
+            {
+                "数据源": getattr(wrapper.obj, "__name__", type(wrapper.obj).__name__),
+                "默认 TTL(秒)": wrapper.cache_time,
+                "条目数": info["entries"],
+                "内存(MB)": round(info["bytes"] / 1024 / 1024, 2),
+                "磁盘缓存": str(wrapper.disk.directory) if wrapper.disk else "-",
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def render_diagnostics_page() -> None:
+    st.title("诊断")
+    st.caption("本进程内各 akshare 接口和 st.cache_data 辅助函数的命中、耗时与数据量统计。")
+
+    snapshot = metrics.snapshot()
+    if snapshot.empty:
+        st.info("暂无统计数据，先打开其他页面触发数据加载。")
+    else:
+        snapshot["命中率"] = (snapshot["hits"] / snapshot["calls"]).round(3)
+        snapshot["avg_latency"] = snapshot["avg_latency"].round(3)
+        st.subheader("调用统计")
+        st.dataframe(snapshot, use_container_width=True, hide_index=True)
+
+    st.subheader("缓存占用")
+    st.dataframe(build_cache_usage(), use_container_width=True, hide_index=True)
+
+    st.subheader("Prometheus 指标")
+    text = metrics.render_prometheus()
+    st.download_button("下载指标", text, file_name="stockview_metrics.txt")
+    st.code(text, language="text")
+
+    if st.button("重置统计"):
+        metrics.reset()
+        st.rerun()
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from stockview.log import logger
+
+
+@dataclass
+class FetchTask:
+    name: str
+    func: Callable[..., Any]
+    deps: tuple[str, ...] = ()
+    timeout: float | None = None
+    default: Any = None
+
+
+@dataclass
+class FetchResult:
+    """一次 FetchPlan 执行的结果，失败或超时的任务取 default。"""
+
+    values: dict[str, Any] = field(default_factory=dict)
+    errors: dict[str, BaseException] = field(default_factory=dict)
+    elapsed: dict[str, float] = field(default_factory=dict)
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def ok(self, name) -> bool:
+        return name in self.values and name not in self.errors
+
+
+def _streamlit_context_initializer():
+    """让线程池中的线程共享当前 Streamlit 会话，以便调用 st.cache_data 函数。"""
+    try:
+        from streamlit.runtime.scriptrunner import (
+            add_script_run_ctx,
+            get_script_run_ctx,
+        )
+    except ImportError:
+        return None
+
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None:
+        return None
+    return lambda: add_script_run_ctx(threading.current_thread(), ctx)
+
+
+class FetchPlan:
+    """
+    声明一组相互独立或有依赖关系的 I/O 任务，在有界线程池中并发执行。
+
+    - 任务在所有依赖完成后才提交，函数按 deps 的顺序接收依赖的结果；
+    - 每个任务有自己的超时，超时或失败的任务取 default，不影响其他任务；
+    - 依赖失败的任务直接取 default，不再执行。
+
+    冷启动耗时约等于依赖链上最慢的一串调用，而不是所有调用之和。
+    """
+
+    def __init__(self, max_workers=6, timeout=20.0):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.tasks: dict[str, FetchTask] = {}
+
+    def add(self, name, func, *, deps=(), timeout=None, default=None):
+        for dep in deps:
+            if dep not in self.tasks:
+                raise ValueError(f"任务 {name} 依赖未声明的任务 {dep}")
+        self.tasks[name] = FetchTask(name, func, tuple(deps), timeout, default)
+        return self
+
+    def run(self) -> FetchResult:
+        result = FetchResult()
+        pending = dict(self.tasks)
+        running = {}
+        started_at = {}
+        deadlines = {}
+        executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="fetch-plan",
+            initializer=_streamlit_context_initializer(),
+        )
+
+        def fail(task, error):
+            result.values[task.name] = task.default
+            result.errors[task.name] = error
+
+        try:
+            while pending or running:
+                for task in list(pending.values()):
+                    if any(dep not in result.values for dep in task.deps):
+                        continue
+                    del pending[task.name]
+                    failed = [dep for dep in task.deps if dep in result.errors]
+                    if failed:
+                        fail(task, RuntimeError(f"依赖 {', '.join(failed)} 获取失败"))
+                        continue
+                    args = [result.values[dep] for dep in task.deps]
+                    future = executor.submit(task.func, *args)
+                    running[future] = task
+                    started_at[task.name] = time.perf_counter()
+                    deadlines[task.name] = started_at[task.name] + (
+                        task.timeout if task.timeout is not None else self.timeout
+                    )
+
+                if not running:
+                    continue
+
+                now = time.perf_counter()
+                next_deadline = min(deadlines[task.name] for task in running.values())
+                done, _ = wait(
+                    running,
+                    timeout=max(0.0, next_deadline - now),
+                    return_when=FIRST_COMPLETED,
+                )
+                now = time.perf_counter()
+
+                for future in done:
+                    task = running.pop(future)
+                    result.elapsed[task.name] = now - started_at[task.name]
+                    try:
+                        result.values[task.name] = future.result()
+                    except Exception as e:
+                        logger.warning(f"获取 {task.name} 失败，使用默认值：{str(e)}")
+                        fail(task, e)
+
+                for future, task in list(running.items()):
+                    if now >= deadlines[task.name]:
+                        # 无法中断正在运行的线程，只是不再等待它的结果
+                        running.pop(future)
+                        future.cancel()
+                        result.elapsed[task.name] = now - started_at[task.name]
+                        logger.warning(
+                            f"获取 {task.name} 超时（{result.elapsed[task.name]:.1f} 秒），使用默认值"
+                        )
+                        fail(task, TimeoutError(f"{task.name} 超时"))
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        logger.info(
+            "并发获取完成: "
+            + ", ".join(f"{name} {t:.2f}s" for name, t in sorted(result.elapsed.items()))
+        )
+        return result
@@ -0,0 +1,259 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from stockview.breadth import float_column, top_k_order
+from stockview.log import logger
+
+
+@dataclass(frozen=True, eq=False)
+class FlowWindow:
+    """
+    最近若干个刷新间隔的个股成交增量，按时间从早到晚排列。
+
+    amount_deltas/volume_deltas 的形状为 (间隔数, 股票数)，列与 codes 对齐；
+    times[i] 为第 i 个间隔结束时（即该份行情的抓取时间）的时间戳（秒）。
+    """
+
+    codes: np.ndarray
+    names: np.ndarray
+    price: np.ndarray
+    change: np.ndarray
+    times: np.ndarray
+    amount_deltas: np.ndarray
+    volume_deltas: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "FlowWindow":
+        none = np.empty(0)
+        return cls(none, none, none, none, none, np.empty((0, 0)), np.empty((0, 0)))
+
+    def _overlap(self, minutes: float, until_minutes: float = 0) -> tuple[np.ndarray, float]:
+        """
+        每个间隔落在 (now - minutes, now - until_minutes] 内的比例，以及窗口实际覆盖的分钟数。
+
+        一个间隔的增量按时间均匀分摊：行情约 3 分钟才刷新一次，"近 5 分钟" 只计入跨越窗口
+        起点的那个间隔的一部分，而不是整段增量。最早的间隔没有记录起点，按间隔中位数估算。
+        """
+        if len(self.times) == 0:
+            return np.zeros(0), 0.0
+        gaps = np.diff(self.times)
+        first_start = self.times[0] - (np.median(gaps) if len(gaps) else 60.0)
+        starts = np.concatenate([[first_start], self.times[:-1]])
+
+        latest = self.times[-1]
+        low, high = latest - minutes * 60, latest - until_minutes * 60
+        covered = np.clip(np.minimum(self.times, high) - np.maximum(starts, low), 0.0, None)
+        lengths = self.times - starts
+        fractions = np.divide(
+            covered, lengths, out=np.zeros_like(covered), where=lengths > 0
+        )
+        return fractions, float(covered.sum()) / 60
+
+    def recent_amount(self, minutes: float) -> np.ndarray:
+        """每只股票最近 minutes 分钟的成交额（跨越窗口起点的间隔按时间比例计入）。"""
+        fractions, _ = self._overlap(minutes)
+        return fractions @ self.amount_deltas
+
+    def _table(self, rows: np.ndarray, **columns) -> pd.DataFrame:
+        """取 rows 对应的股票，columns 为与 codes 对齐的整列数组。"""
+        table = pd.DataFrame(
+            {
+                "代码": self.codes[rows],
+                "名称": self.names[rows],
+                "最新价": self.price[rows],
+                "涨跌幅": self.change[rows],
+                **{name: values[rows] for name, values in columns.items()},
+            }
+        )
+        return table.reset_index(drop=True)
+
+    def leaderboard(self, minutes: float = 5, top: int = 20) -> pd.DataFrame:
+        """最近 minutes 分钟成交额排行。"""
+        if len(self.times) == 0:
+            return pd.DataFrame()
+        amount = self.recent_amount(minutes)
+        rows = top_k_order(amount, top)
+        rows = rows[amount[rows] > 0]
+        total = amount.sum()
+        return self._table(
+            rows,
+            **{
+                f"近{minutes:g}分钟成交额": amount,
+                "占全市场比例": amount / total if total else np.zeros_like(amount),
+            },
+        )
+
+    def acceleration(
+        self,
+        minutes: float = 5,
+        baseline_minutes: float = 30,
+        top: int = 20,
+        min_amount: float = 1e7,
+    ) -> pd.DataFrame:
+        """
+        成交加速筛选：最近 minutes 分钟的每分钟成交额相对之前 baseline_minutes 分钟的倍数。
+
+        最近成交额低于 min_amount 的股票不参与排序，避免小成交额的噪声。
+        """
+        recent_fractions, recent_span = self._overlap(minutes)
+        base_fractions, base_span = self._overlap(baseline_minutes, until_minutes=minutes)
+        if recent_span <= 0 or base_span <= 0:
+            return pd.DataFrame()
+
+        recent = recent_fractions @ self.amount_deltas
+        base = base_fractions @ self.amount_deltas
+        recent_rate = recent / recent_span
+        base_rate = base / base_span
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = np.where(base_rate > 0, recent_rate / base_rate, np.nan)
+        ratio[recent < min_amount] = np.nan
+
+        rows = top_k_order(ratio, top)
+        rows = rows[~np.isnan(ratio[rows])]
+        return self._table(
+            rows,
+            **{
+                f"近{minutes:g}分钟成交额": recent,
+                "每分钟成交额": recent_rate,
+                "基准每分钟成交额": base_rate,
+                "加速倍数": ratio,
+            },
+        )
+
+
+class FlowTracker:
+    """
+    由连续的 stock_zh_a_spot_em 快照计算每个刷新间隔的个股成交增量。
+
+    每个交易日第一次更新时把代码排序固定为数组位置，之后每次快照用 np.searchsorted
+    对齐到这些位置，再与上一份快照的累计 成交额/成交量 相减。增量保存在
+    (capacity, 股票数) 的环形数组中，每次更新都是 O(n) 的数组运算。
+    """
+
+    def __init__(self, capacity=60):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._reset(None, np.empty(0, dtype=str))
+
+    def _reset(self, day: date | None, codes: np.ndarray):
+        n = len(codes)
+        self.day = day
+        self.codes = codes
+        self.names = np.full(n, "", dtype=object)
+        self.price = np.full(n, np.nan)
+        self.change = np.full(n, np.nan)
+        self.prev_amount: np.ndarray | None = None
+        self.prev_volume: np.ndarray | None = None
+        self.times = np.zeros(self.capacity)
+        self.amount_deltas = np.zeros((self.capacity, n))
+        self.volume_deltas = np.zeros((self.capacity, n))
+        self.count = 0  # 已写入的间隔总数
+
+    def _positions(self, codes: np.ndarray) -> np.ndarray:
+        """快照中每只股票在当天代码数组中的位置，新出现的代码会扩充代码数组。"""
+        positions = np.searchsorted(self.codes, codes)
+        known = positions < len(self.codes)
+        known[known] = self.codes[positions[known]] == codes[known]
+        if not known.all():
+            self._extend(codes[~known])
+            positions = np.searchsorted(self.codes, codes)
+        return positions
+
+    def _extend(self, new_codes: np.ndarray):
+        """盘中出现新代码（很少发生）时重建代码数组，并把已有数据搬到新位置。"""
+        codes = np.union1d(self.codes, new_codes)
+        moved = np.searchsorted(codes, self.codes)
+        n = len(codes)
+
+        def widen(values, fill):
+            widened = np.full(values.shape[:-1] + (n,), fill, dtype=values.dtype)
+            widened[..., moved] = values
+            return widened
+
+        self.names = widen(self.names, "")
+        self.price = widen(self.price, np.nan)
+        self.change = widen(self.change, np.nan)
+        if self.prev_amount is not None:
+            self.prev_amount = widen(self.prev_amount, np.nan)
+            self.prev_volume = widen(self.prev_volume, np.nan)
+        self.amount_deltas = widen(self.amount_deltas, 0.0)
+        self.volume_deltas = widen(self.volume_deltas, 0.0)
+        self.codes = codes
+
+    def update(self, spot: pd.DataFrame, now: datetime) -> bool:
+        """
+        写入一份快照，返回是否产生了新的间隔。
+
+        第一份快照只作为基准；与上一份完全相同的快照（上游还没有刷新）被忽略。
+        """
+        if spot.empty:
+            return False
+        codes = spot["代码"].to_numpy(dtype=str)
+        amount = float_column(spot, "成交额")
+        volume = float_column(spot, "成交量")
+
+        with self._lock:
+            if self.day != now.date():
+                self._reset(now.date(), np.unique(codes))
+            positions = self._positions(codes)
+
+            aligned_amount = np.full(len(self.codes), np.nan)
+            aligned_volume = np.full(len(self.codes), np.nan)
+            aligned_amount[positions] = amount
+            aligned_volume[positions] = volume
+            self.names[positions] = spot["名称"].to_numpy(dtype=object)
+            self.price[positions] = float_column(spot, "最新价")
+            self.change[positions] = float_column(spot, "涨跌幅")
+
+            previous_amount, previous_volume = self.prev_amount, self.prev_volume
+            # 本次缺失的股票沿用上一次的累计值
+            if previous_amount is not None:
+                aligned_amount = np.where(
+                    np.isnan(aligned_amount), previous_amount, aligned_amount
+                )
+                aligned_volume = np.where(
+                    np.isnan(aligned_volume), previous_volume, aligned_volume
+                )
+            self.prev_amount, self.prev_volume = aligned_amount, aligned_volume
+
+            if previous_amount is None:
+                return False
+            if np.array_equal(aligned_amount, previous_amount, equal_nan=True):
+                return False
+
+            # 累计值回退（数据源修正）或缺失时增量记为 0
+            amount_delta = np.nan_to_num(aligned_amount - previous_amount, nan=0.0)
+            volume_delta = np.nan_to_num(aligned_volume - previous_volume, nan=0.0)
+            slot = self.count % self.capacity
+            self.amount_deltas[slot] = np.maximum(amount_delta, 0.0)
+            self.volume_deltas[slot] = np.maximum(volume_delta, 0.0)
+            self.times[slot] = now.timestamp()
+            self.count += 1
+
+        logger.info(
+            f"记录成交增量间隔 {self.count}，全市场新增成交额 {amount_delta.sum() / 1e8:.2f} 亿"
+        )
+        return True
+
+    def window(self) -> FlowWindow:
+        """按时间顺序复制出最近的间隔，供页面只读使用。"""
+        with self._lock:
+            filled = min(self.count, self.capacity)
+            if filled == 0:
+                return FlowWindow.empty()
+            order = (np.arange(filled) + self.count - filled) % self.capacity
+            return FlowWindow(
+                codes=self.codes.copy(),
+                names=self.names.copy(),
+                price=self.price.copy(),
+                change=self.change.copy(),
+                times=self.times[order],
+                amount_deltas=self.amount_deltas[order],
+                volume_deltas=self.volume_deltas[order],
+            )
@@ -1,10 +1,71 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
 import pytz
-from datetime import datetime
+
+from stockview.log import logger
+
+
+def load_sina_trade_calendar(source=None):
+    """
+    新浪交易日历，升序的 datetime64[D] 数组。
+
+    source 为 akshare 或 CacheWrapper，默认直接使用 akshare（录制/回放模式下使用对应的后端）。
+    """
+    if source is None:
+        import akshare
+
+        from stockview.akcache.replay import resolve_backend
+
+        source = resolve_backend(akshare)
+    stock_calendar = source.tool_trade_date_hist_sina()
+    return np.sort(
+        pd.to_datetime(stock_calendar["trade_date"]).to_numpy(dtype="datetime64[D]")
+    )
 
 
 class MarketTimeHelper:
-    def __init__(self, timezone="Asia/Shanghai"):
+    """
+    A 股交易时间。
+
+    is_trading_day 使用交易日历（每 calendar_ttl 秒重新获取一次），日历获取失败或日期
+    超出日历范围时退回到按工作日判断，retry_interval 秒后再尝试获取。
+    """
+
+    def __init__(
+        self,
+        timezone="Asia/Shanghai",
+        calendar_loader=load_sina_trade_calendar,
+        calendar_ttl=24 * 3600,
+        retry_interval=600,
+    ):
         self.tz = pytz.timezone(timezone)
+        self.calendar_loader = calendar_loader
+        self.calendar_ttl = calendar_ttl
+        self.retry_interval = retry_interval
+        self._calendar = None
+        self._calendar_checked_at = 0.0
+        self._calendar_lock = threading.Lock()
+
+    def trade_calendar(self):
+        """缓存的交易日历，没有可用日历时返回 None。"""
+        if self.calendar_loader is None:
+            return None
+        now = time.time()
+        with self._calendar_lock:
+            interval = self.calendar_ttl if self._calendar is not None else self.retry_interval
+            if now - self._calendar_checked_at < interval:
+                return self._calendar
+            self._calendar_checked_at = now
+            try:
+                self._calendar = self.calendar_loader()
+            except Exception as e:
+                # 保留上一份日历（如果有），否则按工作日判断
+                logger.warning(f"获取交易日历失败，暂按工作日判断交易日：{str(e)}")
+            return self._calendar
 
     def during_market_time(self, current_time):
         current_time_gmt8 = current_time.astimezone(self.tz)
@@ -31,6 +92,56 @@ class MarketTimeHelper:
             delta = current_time_gmt8 - lunch_end_time
             return 120 + int(delta.total_seconds() // 60)
 
+    def is_trading_day(self, day):
+        """按交易日历判断是否为交易日，没有日历或超出日历范围时按工作日判断。"""
+        calendar = self.trade_calendar()
+        if calendar is not None and len(calendar):
+            target = np.datetime64(day, "D")
+            if calendar[0] <= target <= calendar[-1]:
+                position = np.searchsorted(calendar, target)
+                return bool(calendar[position] == target)
+        return day.weekday() < 5
+
+    def in_trading_session(self, current_time):
+        """是否处于连续竞价时段（09:30-11:30, 13:00-15:00），午休不算。"""
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        if not self.is_trading_day(current_time_gmt8.date()):
+            return False
+        market_open_time, lunch_start_time, lunch_end_time, market_close_time = (
+            self._get_market_times(current_time_gmt8)
+        )
+        return (
+            market_open_time <= current_time_gmt8 < lunch_start_time
+            or lunch_end_time <= current_time_gmt8 < market_close_time
+        )
+
+    def next_market_open(self, current_time):
+        """下一次开盘（含午后开盘）时间，当前处于交易时段时返回当前时间。"""
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        if self.in_trading_session(current_time_gmt8):
+            return current_time_gmt8
+        day = current_time_gmt8
+        for _ in range(15):
+            if self.is_trading_day(day.date()):
+                market_open_time, _, lunch_end_time, _ = self._get_market_times(day)
+                for session_open in (market_open_time, lunch_end_time):
+                    if session_open > current_time_gmt8:
+                        return session_open
+            day = day + timedelta(days=1)
+        raise ValueError(f"{current_time} 之后 15 天内没有交易日")
+
+    def next_market_close(self, current_time):
+        """下一次收盘时间（当天 15:00 之前返回当天收盘时间）。"""
+        current_time_gmt8 = current_time.astimezone(self.tz)
+        day = current_time_gmt8
+        for _ in range(15):
+            if self.is_trading_day(day.date()):
+                market_close_time = self._get_market_times(day)[3]
+                if market_close_time > current_time_gmt8:
+                    return market_close_time
+            day = day + timedelta(days=1)
+        raise ValueError(f"{current_time} 之后 15 天内没有交易日")
+
     def _get_market_times(self, current_time_gmt8):
         market_open_time = self.tz.localize(
             datetime.combine(
@@ -3,19 +3,132 @@ from __future__ import annotations
 from pathlib import Path
 
 import pandas as pd
+import plotly.graph_objects as go
 import streamlit as st
 
-from scripts.if_im_style_analysis import run_analysis
+from scripts.if_im_style_analysis import (
+    SWEEP_FILE,
+    WALK_FORWARD_FILE,
+    run_analysis,
+    walk_forward_stats,
+)
+from stockview.akcache.metrics import tracked_cache_data
 
 
 OUTPUT_DIR = "outputs/if_im_style_analysis"
+# 参数扫描热力图可选的指标 -> 展示名称
+SWEEP_VALUES = {
+    "excess_return": "相对基线的超额收益",
+    "avg_return": "条件期望收益",
+    "win_rate": "条件胜率",
+}
 
 
-@st.cache_data(ttl=300)
+@tracked_cache_data(ttl=300)
 def load_if_im_summary() -> dict[str, object]:
     return run_analysis(output_dir=OUTPUT_DIR)
 
 
+@tracked_cache_data(ttl=300)
+def load_sweep_results(modified_at: float) -> pd.DataFrame:
+    # modified_at 只用作缓存键，重新扫描后读取新文件
+    return pd.read_parquet(Path(OUTPUT_DIR) / SWEEP_FILE)
+
+
+def render_sweep_heatmap() -> None:
+    st.subheader("参数扫描")
+    path = Path(OUTPUT_DIR) / SWEEP_FILE
+    if not path.exists():
+        st.caption("运行 python scripts/if_im_style_analysis.py --sweep 生成参数扫描结果")
+        return
+
+    results = load_sweep_results(path.stat().st_mtime)
+    if "metric" in results:
+        first = results.iloc[0]
+        window = first["percentile_window"]
+        st.caption(
+            f"距离 {first['metric']}，特征权重 {first['weights'] or '无'}，"
+            f"分位数回看 {'全部历史' if pd.isna(window) else f'{int(window)} 个交易日'}"
+        )
+    col1, col2, col3 = st.columns(3)
+    features = col1.selectbox("特征组合", sorted(results["features"].unique()))
+    horizon = col2.selectbox("持有期", sorted(results["horizon"].unique()))
+    value = col3.selectbox("指标", list(SWEEP_VALUES), format_func=SWEEP_VALUES.get)
+
+    selected = results[(results["features"] == features) & (results["horizon"] == horizon)]
+    grid = selected.pivot(index="exclude_recent_days", columns="neighbors", values=value)
+    fig = go.Figure(
+        go.Heatmap(
+            z=grid.to_numpy(),
+            x=[str(column) for column in grid.columns],
+            y=[str(index) for index in grid.index],
+            colorscale="RdYlGn",
+            zmid=0 if value == "excess_return" else None,
+            text=grid.map(lambda item: f"{item:.1%}" if value == "win_rate" else f"{item:.2%}"),
+            texttemplate="%{text}",
+            colorbar=dict(title=SWEEP_VALUES[value]),
+        )
+    )
+    fig.update_layout(
+        xaxis=dict(title="相似状态采样数量", type="category"),
+        yaxis=dict(title="排除最近天数", type="category"),
+        height=400,
+    )
+    st.plotly_chart(fig, use_container_width=True)
+
+
+@tracked_cache_data(ttl=300)
+def load_walk_forward(modified_at: float) -> pd.DataFrame:
+    # modified_at 只用作缓存键，重新回测后读取新文件
+    return pd.read_csv(Path(OUTPUT_DIR) / WALK_FORWARD_FILE, parse_dates=["日期"])
+
+
+def render_walk_forward_chart() -> None:
+    st.subheader("逐日回测：预测 vs 实际")
+    path = Path(OUTPUT_DIR) / WALK_FORWARD_FILE
+    if not path.exists():
+        st.caption("运行 python scripts/if_im_style_analysis.py --walk-forward 生成逐日回测结果")
+        return
+
+    backtest = load_walk_forward(path.stat().st_mtime)
+    horizon = st.selectbox(
+        "回测持有期", sorted(backtest["horizon"].unique()), key="walk_forward_horizon"
+    )
+    selected = backtest[backtest["horizon"] == horizon].dropna(subset=["predicted_return"])
+    stats = walk_forward_stats(selected)
+    if stats["count"] >= 2:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("预测与实际收益相关系数", f"{stats['correlation']:.3f}")
+        col2.metric("方向准确率", f"{stats['direction_accuracy']:.1%}")
+        col3.metric("回测交易日", stats["count"])
+
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=selected["日期"],
+            y=selected["predicted_return"] * 100,
+            name="相似状态预测收益(%)",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=selected["日期"],
+            y=selected["realised_return"].rolling(20, min_periods=1).mean() * 100,
+            name="实际收益 20日均值(%)",
+        )
+    )
+    fig.add_trace(
+        go.Scatter(
+            x=selected["日期"],
+            y=selected["baseline_return"] * 100,
+            name="基线收益(%)",
+            line=dict(dash="dot"),
+        )
+    )
+    fig.update_layout(hovermode="x unified", height=450)
+    st.plotly_chart(fig, use_container_width=True)
+
+
 def render_if_im_page() -> None:
     st.title("IF / IM 风格配对")
     st.caption("自动抓取最新指数、估值和股指期货连续合约，评估当前做多 IF / 做空 IM 的统计优势。")
@@ -99,3 +212,5 @@ def render_if_im_page() -> None:
         existing_columns = [column for column in keep_columns if column in nearest.columns]
         st.dataframe(nearest[existing_columns].head(30), use_container_width=True, hide_index=True)
 
+    render_sweep_heatmap()
+    render_walk_forward_chart()
@@ -1,35 +1,28 @@
 from datetime import datetime, timedelta
 
-import akshare
 import altair as alt
 import pandas as pd
 import streamlit as st
 
-from stockview.akcache.akcache import CacheWrapper
+from stockview.akcache import history_store
+from stockview.akcache.metrics import tracked_cache_data
 
-ak = CacheWrapper(akshare, cache_time=180)
 
-
-@st.cache_data(ttl=180)
+@tracked_cache_data(ttl=180)
 def build_index_amount_dataframe(days: int = 365) -> pd.DataFrame:
     end_date = datetime.now().strftime("%Y%m%d")
     start_date = (datetime.now() - timedelta(days=days)).strftime("%Y%m%d")
 
-    index_300 = ak.index_zh_a_hist(
-        symbol="000300", period="daily", start_date=start_date, end_date=end_date
-    )
-    index_1000 = ak.index_zh_a_hist(
-        symbol="399852", period="daily", start_date=start_date, end_date=end_date
-    )
-    index_2000 = ak.index_zh_a_hist(
-        symbol="932000", period="daily", start_date=start_date, end_date=end_date
-    )
-    sh_index = ak.index_zh_a_hist(
-        symbol="000001", period="daily", start_date=start_date, end_date=end_date
-    )
-    sz_index = ak.index_zh_a_hist(
-        symbol="399001", period="daily", start_date=start_date, end_date=end_date
-    )
+    index_300, index_1000, index_2000, sh_index, sz_index = [
+        history_store.get(
+            "index_zh_a_hist",
+            symbol=symbol,
+            start_date=start_date,
+            end_date=end_date,
+            period="daily",
+        )
+        for symbol in ["000300", "399852", "932000", "000001", "399001"]
+    ]
 
     df = pd.DataFrame(
         {
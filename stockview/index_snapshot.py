@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from stockview.log import logger
+
+# stock_zh_index_spot_em 的指数板块，同一代码出现在多个板块时保留先出现的一行
+INDEX_BOARDS: tuple[str, ...] = (
+    "上证系列指数",
+    "深证系列指数",
+    "中证系列指数",
+    "沪深重要指数",
+)
+
+
+def fetch_index_board(source, board: str) -> pd.DataFrame | None:
+    """获取一个指数板块的行情，失败时记录日志并返回 None。"""
+    try:
+        return source.stock_zh_index_spot_em(symbol=board)
+    except Exception as e:
+        logger.warning(f"获取指数板块 {board} 行情失败：{str(e)}")
+        return None
+
+
+@dataclass(frozen=True, eq=False)
+class IndexSpotSnapshot:
+    """
+    一次刷新内所有指数板块的实时行情。
+
+    各板块只请求一次，按代码去重后建立 代码 -> 行号 的哈希索引，
+    之后任意次数的价格/成交额查询都是 O(1)。
+    """
+
+    frame: pd.DataFrame
+    fetched_at: float = field(default_factory=time.time)
+    rows: dict[str, int] = field(init=False, repr=False)
+    columns: dict[str, np.ndarray] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        codes = self.frame["代码"].astype(str).tolist()
+        object.__setattr__(self, "rows", {code: i for i, code in enumerate(codes)})
+        object.__setattr__(
+            self,
+            "columns",
+            {column: self.frame[column].to_numpy() for column in self.frame.columns},
+        )
+
+    @classmethod
+    def fetch(cls, source, boards=INDEX_BOARDS) -> "IndexSpotSnapshot":
+        """从 source（akshare 或 CacheWrapper）依次获取各板块行情，单个板块失败时跳过。"""
+        return cls.from_frames([fetch_index_board(source, board) for board in boards])
+
+    @classmethod
+    def from_frames(cls, frames) -> "IndexSpotSnapshot":
+        """合并各板块行情，None 表示该板块获取失败，跳过。"""
+        frames = [frame for frame in frames if frame is not None]
+        if not frames:
+            raise RuntimeError("所有指数板块行情获取失败")
+
+        frame = (
+            pd.concat(frames, ignore_index=True)
+            .drop_duplicates(subset="代码", keep="first")
+            .reset_index(drop=True)
+        )
+        logger.info(f"获取 {len(frames)} 个指数板块行情，共 {len(frame)} 个指数")
+        return cls(frame)
+
+    def __contains__(self, code) -> bool:
+        return code in self.rows
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def value(self, code: str, column: str):
+        """返回指数 code 的某一列，代码不存在时抛出 KeyError。"""
+        return self.columns[column][self.rows[code]]
+
+    def price(self, code: str) -> float:
+        return float(self.value(code, "最新价"))
+
+    def amount(self, code: str) -> float:
+        return float(self.value(code, "成交额"))
@@ -1,14 +1,18 @@
 import streamlit as st
-import akshare as ak
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from stockview.akcache import history_store
 
 
 def get_index_data(index_code, start_date, end_date):
     """获取指数数据"""
-    df = ak.index_zh_a_hist(
-        symbol=index_code, period="daily", start_date=start_date, end_date=end_date
+    df = history_store.get(
+        "index_zh_a_hist",
+        symbol=index_code,
+        start_date=start_date,
+        end_date=end_date,
+        period="daily",
     )
 
     df["日期"] = pd.to_datetime(df["日期"])
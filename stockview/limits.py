@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# 板块规则：代码前缀 -> 涨跌幅限制，按前缀长度从长到短匹配，未匹配的是主板 10%
+BOARD_RULES: tuple[tuple[str, float], ...] = (
+    ("92", 0.30),  # 北交所（新代码段）
+    ("30", 0.20),  # 创业板
+    ("68", 0.20),  # 科创板
+    ("8", 0.30),  # 北交所
+    ("4", 0.30),  # 北交所（原新三板代码段）
+)
+MAIN_BOARD_LIMIT = 0.10
+# 主板 ST 股票涨跌幅限制，创业板/科创板/北交所的 ST 股票沿用板块限制
+ST_LIMIT = 0.05
+# 名称以 N（上市首日）或 C（注册制上市前 5 日）开头的新股不设涨跌幅限制
+NO_LIMIT_NAME_PREFIXES = ("N", "C")
+# 距离涨跌停价不超过该比例（相对昨收）视为接近涨跌停
+NEAR_LIMIT = 0.01
+# 价格比较容差，避免浮点误差
+PRICE_EPSILON = 1e-6
+
+
+@dataclass(frozen=True)
+class LimitStats:
+    """按板块规则统计的涨跌停情况。"""
+
+    limit_up: int
+    limit_down: int
+    near_limit_up: int  # 接近涨停但未封板
+    near_limit_down: int  # 接近跌停但未封板
+    broken: int  # 炸板：盘中最高价触及涨停价，当前价低于涨停价
+
+
+def round_price(price: np.ndarray) -> np.ndarray:
+    """按交易所规则四舍五入到分（0.5 分进位，不是银行家舍入）。"""
+    return np.floor(price * 100 + 0.5 + PRICE_EPSILON) / 100
+
+
+def limit_ratios(codes: np.ndarray, names: np.ndarray) -> np.ndarray:
+    """返回每只股票的涨跌幅限制比例，没有限制的股票为 NaN。"""
+    ratios = np.full(len(codes), MAIN_BOARD_LIMIT)
+    matched = np.zeros(len(codes), dtype=bool)
+    for prefix, ratio in BOARD_RULES:
+        mask = ~matched & np.char.startswith(codes, prefix)
+        ratios[mask] = ratio
+        matched |= mask
+
+    is_st = np.char.find(np.char.upper(names), "ST") >= 0
+    ratios[~matched & is_st] = ST_LIMIT
+
+    new_listing = np.zeros(len(names), dtype=bool)
+    for prefix in NO_LIMIT_NAME_PREFIXES:
+        new_listing |= np.char.startswith(names, prefix)
+    ratios[new_listing] = np.nan
+    return ratios
+
+
+def limit_prices(
+    prev_close: np.ndarray, ratios: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """由昨收和涨跌幅限制计算涨停价和跌停价。"""
+    return round_price(prev_close * (1 + ratios)), round_price(prev_close * (1 - ratios))
+
+
+def compute_limit_stats(spot: pd.DataFrame, near_limit: float = NEAR_LIMIT) -> LimitStats:
+    """
+    在 stock_zh_a_spot_em 快照上按板块规则统计涨跌停。
+
+    涨跌停价由昨收精确计算，最新价达到涨停价（跌停价）即计为涨停（跌停）；
+    停牌、无昨收和无涨跌幅限制的新股不计入。
+    """
+    if spot.empty:
+        return LimitStats(0, 0, 0, 0, 0)
+
+    codes = spot["代码"].to_numpy(dtype=str)
+    names = spot["名称"].fillna("").to_numpy(dtype=str)
+    price = pd.to_numeric(spot["最新价"], errors="coerce").to_numpy(dtype=float)
+    high = pd.to_numeric(spot["最高"], errors="coerce").to_numpy(dtype=float)
+    prev_close = pd.to_numeric(spot["昨收"], errors="coerce").to_numpy(dtype=float)
+
+    ratios = limit_ratios(codes, names)
+    up_price, down_price = limit_prices(prev_close, ratios)
+    valid = (price > 0) & (prev_close > 0) & ~np.isnan(ratios)
+
+    at_up = valid & (price >= up_price - PRICE_EPSILON)
+    at_down = valid & (price <= down_price + PRICE_EPSILON)
+    near_up = valid & ~at_up & (price >= up_price - prev_close * near_limit)
+    near_down = valid & ~at_down & (price <= down_price + prev_close * near_limit)
+    broken = valid & ~at_up & (high >= up_price - PRICE_EPSILON)
+
+    return LimitStats(
+        limit_up=int(at_up.sum()),
+        limit_down=int(at_down.sum()),
+        near_limit_up=int(near_up.sum()),
+        near_limit_down=int(near_down.sum()),
+        broken=int(broken.sum()),
+    )
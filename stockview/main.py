@@ -1,23 +1,51 @@
 import streamlit as st
-from datetime import date, datetime
+from dataclasses import replace
+from datetime import date, datetime, timedelta
+import numpy as np
 import pandas as pd
 from stockview.log import logger
 import pytz
 
 # from streamlit_autorefresh import st_autorefresh
 import akshare
-from stockview.akcache import CacheWrapper
+from stockview.akcache import CacheWrapper, akshare_ttl_policy
+from stockview.amount_curve import AmountCurveProfiles, build_amount_profiles
+from stockview.akcache.metrics import tracked_cache_data
+from stockview.breadth import MarketBreadth, compute_market_breadth
+from stockview.fetch_plan import FetchPlan
+from stockview.market_heat import AMOUNT_LABELS, LABELS, SENTIMENT_LABELS, MarketHeat
+from stockview.flow import FlowTracker, FlowWindow
+from stockview.metric_history import MetricRingBuffer
+from stockview.snapshot_daemon import MarketSnapshot, SnapshotDaemon
+from stockview.index_snapshot import INDEX_BOARDS, IndexSpotSnapshot, fetch_index_board
 from stockview.options import analyze_atm_options, find_primary_options
-from stockview.helpers import during_market_time, minutes_since_market_open
+from stockview.helpers import (
+    during_market_time,
+    load_sina_trade_calendar,
+    minutes_since_market_open,
+)
 from streamlit_autorefresh import st_autorefresh
 from stockview.index_spread import create_spread_chart
 import sys
 import os
 
-ak = CacheWrapper(akshare, cache_time=180)
+# 过期数据先返回、后台刷新，上游故障时最多沿用一天前的最后一次成功结果
+ak = CacheWrapper(
+    akshare,
+    cache_time=180,
+    stale_while_revalidate=True,
+    stale_time=24 * 3600,
+    ttl_policy=akshare_ttl_policy,
+)
 
 
-@st.cache_data(ttl=60)
+@tracked_cache_data(ttl=42000)
+def get_trade_calendar():
+    """交易日历，升序的 datetime64[D] 数组。"""
+    return load_sina_trade_calendar(ak)
+
+
+@tracked_cache_data(ttl=60)
 def is_trade_date(date):
     """
     判断是否是交易日。
@@ -29,9 +57,10 @@ def is_trade_date(date):
     bool: 如果是交易日，则返回 True；否则返回 False。
     """
     try:
-        stock_calendar = ak.tool_trade_date_hist_sina()
-        stock_calendar_dates = pd.to_datetime(stock_calendar["trade_date"]).dt.date
-        if date in set(stock_calendar_dates):
+        trade_dates = get_trade_calendar()
+        day = np.datetime64(date, "D")
+        position = np.searchsorted(trade_dates, day)
+        if position < len(trade_dates) and trade_dates[position] == day:
             logger.info(f"{date} 是交易日")
             return True
         else:
@@ -42,173 +71,138 @@ def is_trade_date(date):
         raise
 
 
-# 只需要每天执行一次，获取成交量分时比例
-@st.cache_data(ttl=42000)
-def get_amount_curve(ndays):
-    """
-    获取指定天数的成交量曲线。
+def get_minute_bars(symbol):
+    """获取指数 15 分钟 K 线。"""
+    return ak.stock_zh_a_minute(symbol=symbol, period="15", adjust="qfq")
 
-    参数:
-    ndays (int): 要获取的天数。
+
+def minute_amount_bars(sh, sz):
+    """
+    上证和深证指数 15 分钟 K 线按 K 线时间对齐后合计成交量，不含当天。
 
     返回:
-    list: 包含每15分钟成交量百分比的列表。
+    DataFrame: day（K 线结束时间）和 amount 两列。
+    """
+    bars = pd.merge(
+        sh[["day", "volume"]],
+        sz[["day", "volume"]],
+        on="day",
+        suffixes=("_sh", "_sz"),
+    )
+    bars["day"] = pd.to_datetime(bars["day"])
+    bars["amount"] = pd.to_numeric(bars["volume_sh"]) + pd.to_numeric(bars["volume_sz"])
+    # 获取本日之前15分钟数据，当日不要。
+    today = datetime.combine(date.today(), datetime.min.time())
+    return bars.loc[bars["day"] < today, ["day", "amount"]]
 
-    异常:
-    如果在获取或处理数据时发生错误，将记录错误并抛出异常。
 
-    功能描述:
-    1. 从 akshare 获取上证和深证的分钟数据。
-    2. 合并数据并计算总成交量。
-    3. 过滤掉当天的数据，只保留指定天数的数据。
-    4. 计算每15分钟的成交量占当天总成交量的百分比。
-    5. 生成并返回成交量曲线。
-
-    日志:
-    - 记录获取数据的开始和成功信息。
-    - 记录数据处理完成的信息。
-    - 记录百分比数据计算成功的信息。
-    - 记录生成成交量曲线的信息。
-    - 记录任何发生的错误。
+# 只需要每天执行一次，获取成交量分时比例
+@tracked_cache_data(ttl=42000)
+def get_amount_profiles() -> AmountCurveProfiles:
     """
-    logger.info(f"开始获取成交量曲线，天数：{ndays}")
-    try:
-        stock_zh_a_minute_df_sh = ak.stock_zh_a_minute(
-            symbol="sh000001", period="15", adjust="qfq"
-        )
-        stock_zh_a_minute_df_sz = ak.stock_zh_a_minute(
-            symbol="sz399001", period="15", adjust="qfq"
-        )
-        logger.info("成功获取上证和深证分钟数据")
-
-        df = pd.concat([stock_zh_a_minute_df_sh, stock_zh_a_minute_df_sz], axis=1)
-        df2 = df.iloc[:, [0, 5, 11]].copy(deep=True)
-        df2.columns = ["day", "amount_sh", "amount_sz"]
-        df2["amount_sh"] = pd.to_numeric(df2["amount_sh"])
-        df2["amount_sz"] = pd.to_numeric(df2["amount_sz"])
-        df2["date"] = pd.to_datetime(df2["day"])  # format='%Y-%m-%d %H:%M:%S'
-        df2["totalamount"] = df2.apply(
-            lambda x: (x["amount_sh"] + x["amount_sz"]), axis=1
-        )
-        df2.drop(["day"], axis=1, inplace=True)
-        df2 = df2[
-            df2["date"] < datetime.combine(date.today(), datetime.min.time())
-        ]  # 获取本日之前15分钟数据，当日不要。
-        df2 = df2.tail(ndays * 16)  # 取n天的数据，一天16个数据。
-        logger.info(f"数据处理完成，共{len(df2)}条记录")
-
-        df_all = pd.DataFrame()
-        for i in range(ndays):
-            df_range = df2.iloc[i * 16 : (i + 1) * 16].copy()  # 创建副本
-            day_amount = df_range.totalamount.sum()
-            df_range.loc[:, "pct"] = df_range.apply(
-                lambda x: (x["totalamount"] / day_amount), axis=1
-            )
-            df_all = pd.concat([df_all, df_range])
-        df_all = df_all.reset_index()
-        logger.info(f"成功计算{ndays}天的百分比数据")
+    按星期几、月末和长假前分别统计的日内成交量分布。
 
-        curve = []
-        for j in range(16):
-            curve.append(df_all[df_all.index % 16 - j == 0].pct.mean())
+    上证、深证分钟线和交易日历并发获取，三者都完成后再统计。
 
-        logger.info(f"成功生成成交量曲线:{curve}")
-        return curve
-    except Exception as e:
-        logger.error(f"获取成交量曲线时发生错误：{str(e)}")
-        raise
+    异常:
+    如果在获取或处理数据时发生错误，将记录错误并抛出异常。
+    """
+    fetched = (
+        FetchPlan(max_workers=3, timeout=20)
+        .add("minute_sh", lambda: get_minute_bars("sh000001"))
+        .add("minute_sz", lambda: get_minute_bars("sz399001"))
+        .add("trade_calendar", get_trade_calendar)
+        .add(
+            "profiles",
+            lambda sh, sz, calendar: build_amount_profiles(
+                minute_amount_bars(sh, sz), calendar
+            ),
+            deps=("minute_sh", "minute_sz", "trade_calendar"),
+        )
+        .run()
+    )
+    if not fetched.ok("profiles"):
+        errors = "; ".join(f"{name}: {str(e)}" for name, e in fetched.errors.items())
+        logger.error(f"获取成交量曲线时发生错误：{errors}")
+        raise RuntimeError(f"获取成交量曲线失败：{errors}")
+    return fetched["profiles"]
 
 
-@st.cache_data(ttl=180)
+@tracked_cache_data(ttl=180)
 def get_estimate_amount(minutes, vol=None):
     """
     估算成交量。
 
+    按今天的交易日类型（长假前、月末或星期几）选择日内分布，
+    插值得到开盘 minutes 分钟后的累计比例，再由当前成交量外推全天。
+
     参数：
     minutes (int): 已交易的分钟数。
     vol (int, 可选): 指定的成交量。如果未提供，将自动获取。
 
     返回：
     int: 估算的成交量。如果发生错误，返回0。
-
-    异常：
-    KeyError: 当计算累计比例时发生键错误。
-    ZeroDivisionError: 当估算成交量时发生除零错误。
-
-    日志：
-    - 记录开始估算成交量的信息。
-    - 记录计算得到的累计比例。
-    - 记录自动获取的成交量（如果未指定）。
-    - 记录估算的成交量。
-    - 记录计算累计比例时的键错误警告。
-    - 记录估算成交量时的除零错误。
     """
 
     logger.info(f"开始估算成交量，已交易分钟数：{minutes}，指定成交量：{vol}")
-    curve = get_amount_curve(3)
-    df = pd.DataFrame(curve, columns=["amount"])
-    t = minutes // 15
-    if t > 15:
-        t = 15
-    remaining_minutes = minutes % 15
-
-    try:
-        a = df[0:t]["amount"].sum() + df.loc[t] * remaining_minutes / 15
-
-        logger.info(f"计算得到的累计比例：{a}")
-    except KeyError:
-        a = df[0:t]["amount"].sum()
-        logger.warning(f"计算累计比例时发生KeyError，使用备选方案：{a}")
-        raise
+    today = datetime.now(pytz.timezone("Asia/Shanghai")).date()
+    a = get_amount_profiles().for_day(today).fraction_at(minutes)
+    logger.info(f"计算得到的累计比例：{a}")
 
     if not vol:
         total_amount = get_a_amount()
         vol = total_amount[0] + total_amount[1]
         logger.info(f"自动获取成交量：{vol}")
-    try:
-        estimated_amount = int(vol / a.iloc[0]) if vol > 0 else 0
-        logger.info(f"估算的成交量：{estimated_amount}")
-        return estimated_amount
-    except ZeroDivisionError:
-        logger.error("估算成交量时发生除零错误")
+    if a <= 0:
+        logger.error("累计比例为0，无法估算成交量")
         return 0
+    estimated_amount = int(vol / a) if vol > 0 else 0
+    logger.info(f"估算的成交量：{estimated_amount}")
+    return estimated_amount
 
 
-@st.cache_data(ttl=180)
-def get_n_day_avg_amount(n):
+def mean_amount_before(daily: pd.DataFrame, n: int, day: date) -> float:
     """
-    获取上证和深证指数最近 n 个交易日的平均成交额。
+    day 之前（不含 day）最近 n 个交易日的平均成交额。
+
+    按日期排除当天的 K 线，而不是假定最后一行就是当天：盘前或数据源尚未生成当日
+    K 线时，最后一行是上一个交易日的完整数据。
+    """
+    dates = pd.to_datetime(daily["date"]).dt.date
+    return daily.loc[dates < day, "amount"].tail(n).mean()
+
+
+def get_index_daily(symbol):
+    """获取指数日线。"""
+    return ak.stock_zh_index_daily_em(symbol=symbol)
+
+
+def n_day_avg_amount(n, sh_daily, sz_daily):
+    """
+    上证和深证指数最近 n 个交易日（不含今天）的平均成交额之和。
 
     参数:
         n (int): 要计算的交易日天数。
-
-    返回:
-        tuple: 包含上证和深证指数平均成交额的元组，格式为 (sh_avg_amount, sz_avg_amount)。
+        sh_daily, sz_daily (DataFrame): 上证、深证指数日线。
     """
-    logger.info(f"开始获取最近 {n} 个交易日的平均成交额")
-    try:
-        stock_zh_a_daily_df_sh = ak.stock_zh_index_daily_em(symbol="sh000001")
-        stock_zh_a_daily_df_sz = ak.stock_zh_index_daily_em(symbol="sz399001")
-        logger.info("成功获取上证和深证每日数据")
+    today = datetime.now(pytz.timezone("Asia/Shanghai")).date()
+    sh_amount = int(mean_amount_before(sh_daily, n, today))
+    sz_amount = int(mean_amount_before(sz_daily, n, today))
+    logger.info(
+        f"最近 {n} 个交易日上证平均成交额: {sh_amount}, 深证平均成交额: {sz_amount}"
+    )
+    return sh_amount + sz_amount
 
-        sh_amount = int(stock_zh_a_daily_df_sh["amount"].iloc[-6:-1].mean())
-        sz_amount = int(stock_zh_a_daily_df_sz["amount"].iloc[-6:-1].mean())
 
-        logger.info(
-            f"最近 {n} 个交易日上证平均成交额: {sh_amount}, 深证平均成交额: {sz_amount}"
-        )
-        return sh_amount + sz_amount
-    except Exception as e:
-        logger.error(f"获取最近 {n} 个交易日的平均成交额时发生错误：{str(e)}")
-        return 0, 0
+@tracked_cache_data(ttl=180)
+def get_index_snapshot() -> IndexSpotSnapshot:
+    """获取所有指数板块的实时行情快照，每次刷新只请求一次。"""
+    return IndexSpotSnapshot.fetch(ak)
 
 
-@st.cache_data(ttl=180)
 def get_index_price(symbol):
     try:
-        index_data = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
-        index_value = int(index_data[index_data["代码"] == symbol]["最新价"].values[0])
-        return index_value
+        return int(get_index_snapshot().price(symbol))
     except Exception as e:
         exc_type, exc_obj, tb = sys.exc_info()
         fname = os.path.split(tb.tb_frame.f_code.co_filename)[1]
@@ -218,54 +212,42 @@ def get_index_price(symbol):
         return 0
 
 
-def get_index_amount(symbol):
+def get_index_amount(symbol, snapshot=None):
     try:
-        df_sh = ak.stock_zh_index_spot_em(symbol="上证系列指数")
-        df_sz = ak.stock_zh_index_spot_em(symbol="深证系列指数")
-        df_csi = ak.stock_zh_index_spot_em(symbol="中证系列指数")
-        df_vip = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
-        df = pd.concat([df_sh, df_sz, df_csi, df_vip], axis=0)
-
-        index_value = int(df[df["代码"] == symbol]["成交额"].values[0])
-        return index_value
+        return int((snapshot or get_index_snapshot()).amount(symbol))
     except Exception as e:
         logger.error(f"获取指数 {symbol} 当前成交额时发生错误：{str(e)}")
         raise
 
 
 # 获取当前成交额
-@st.cache_data(ttl=180)
-def get_a_amount() -> tuple[float, float]:
+def get_a_amount(snapshot=None) -> tuple[float, float]:
     """
     获取上证和深证指数的成交量。
 
-    该函数使用 akshare 库获取当前上证指数和深证指数的成交量。
-    如果当前时间不在交易时间内，则将全局的 TTL 变量设置为 3600 秒。
+    该函数从指数行情快照中读取当前上证指数和深证指数的成交量。
+
+    参数:
+        snapshot (IndexSpotSnapshot, 可选): 已获取的快照，未提供时自动获取。
 
     返回:
         tuple: 包含上证和深证指数成交量的元组，格式为 (sh_amount, sz_amount)。
-
-    异常:
-        KeyError: 如果在获取的数据中未找到预期的股票代码（上证为 "000001"，深证为 "399001"）。
     """
 
     try:
         logger.info("开始获取指数数据")
-        spot_df = ak.stock_zh_index_spot_em(symbol="沪深重要指数")
+        snapshot = snapshot or get_index_snapshot()
     except Exception as e:
         logger.error(f"获取指数数据时发生错误：{str(e)}")
         return 0, 0
 
     # 检查是否存在对应的指数代码
-    sh_mask = spot_df["代码"] == "000001"
-    sz_mask = spot_df["代码"] == "399001"
-
-    if not sh_mask.any() or not sz_mask.any():
+    if "000001" not in snapshot or "399001" not in snapshot:
         logger.error("未找到上证或深证指数数据")
         return 0, 0
 
-    sh_amount = spot_df[sh_mask]["成交额"].iloc[0]  # 使用iloc[0]代替values[0]
-    sz_amount = spot_df[sz_mask]["成交额"].iloc[0]  # 深证成交额
+    sh_amount = snapshot.amount("000001")  # 上证成交额
+    sz_amount = snapshot.amount("399001")  # 深证成交额
     logger.info(f"获取上证和深证指数的成交量: 上证 {sh_amount}, 深证 {sz_amount}")
     if pd.isna(sh_amount) or pd.isna(sz_amount):
         logger.error("获取的成交量数据包含 NaN 值")
@@ -274,214 +256,19 @@ def get_a_amount() -> tuple[float, float]:
     return sh_amount, sz_amount
 
 
-@st.cache_data(ttl=180)
-def middle_price_change():
-    """
-    计算所有股票的中位数涨幅。
-
-    该函数获取A股的实时交易数据，并计算所有股票的中间涨幅（即按涨幅排序后位于中间的股票涨幅）。
-
-    返回:
-        float: 中间股票涨幅。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算中间涨幅")
-        return 0
-
-    # 按涨幅排序
-    df_sorted = df.sort_values("涨跌幅")
-
-    # 计算中间位置
-    middle_index = len(df_sorted) // 2
-
-    # 获取中间涨幅
-    middle_price_change = df_sorted.iloc[middle_index]["涨跌幅"]
-    logger.info(f"中间股票涨幅为: {middle_price_change}")
-
-    return middle_price_change
-
-
-@st.cache_data(ttl=180)
-def count_limit_up_stocks():
-    """
-    计算涨停板股票的数量。
-
-    该函数获取A股的实时交易数据，并计算涨停板（涨幅达到10%或以上）的股票数量。
-
-    返回:
-        int: 涨停板股票的数量。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算涨停板数量")
-        return 0
-
-    # 计算涨停板股票的数量，30 开头和 68 开头的是 20% 涨停，其他是 10% 涨停
-    df["涨停板"] = df.apply(
-        lambda row: (
-            row["涨跌幅"] >= 19.9
-            if row["代码"].startswith(("30", "68"))
-            else row["涨跌幅"] >= 29
-            if row["代码"].startswith("8")
-            else row["涨跌幅"] >= 9.9
-        ),
-        axis=1,
-    )
-    limit_up_stocks = df[df["涨停板"] & ~df["代码"].str.startswith("8")].shape[0]
-    logger.info(f"涨停板股票数量: {limit_up_stocks}")
-
-    return limit_up_stocks
-
-
-@st.cache_data(ttl=180)
-def count_limit_down_stocks():
-    """
-    计算跌停板股票的数量。
-
-    该函数获取A股的实时交易数据，并计算跌停板（跌幅达到10%或以上）的股票数量。
-
-    返回:
-        int: 跌停板股票的数量。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算跌停板数量")
-        return 0
-
-    # 计算跌停板股票的数量，30 开头和 68 开头的是 20% 跌停，其他是 10% 跌停
-    df["跌停板"] = df.apply(
-        lambda row: (
-            row["涨跌幅"] <= -19.9
-            if row["代码"].startswith(("30", "68"))
-            else row["涨跌幅"] <= -29
-            if row["代码"].startswith("8")
-            else row["涨跌幅"] <= -9.9
-        ),
-        axis=1,
-    )
-    limit_down_stocks = df[df["跌停板"] & ~df["代码"].str.startswith("8")].shape[0]
-    logger.info(f"跌停板股票数量: {limit_down_stocks}")
-
-    return limit_down_stocks
-
-
-@st.cache_data(ttl=180)
-def stock_up_down_ratio():
-    """
-    计算股票的涨跌比。
-
-    该函数获取A股的实时交易数据，并计算上涨股票数量与下跌股票数量的比值。
-
-    返回:
-        float: 股票的涨跌比。如果数据为空，则返回0。
-    """
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算涨跌比")
-        return 0
-
-    # 计算股票总数
-    num_stocks = len(df)
-
-    # 计算上涨和下跌股票的数量
-    up_stocks = df[df["涨跌幅"] >= 0].shape[0]
-    down_stocks = df[df["涨跌幅"] < 0].shape[0]
-    logger.info(f"上涨股票数量: {up_stocks}, 下跌股票数量: {down_stocks}")
-    if down_stocks == 0:
-        logger.info("没有下跌的股票，涨跌比为无穷大")
-        return float("inf")
-
-    up_down_ratio = (up_stocks / num_stocks) * 100
-    logger.info(f"股票上涨百分比为: {up_down_ratio}")
-
-    return up_down_ratio
-
-
-@st.cache_data(ttl=180)
-def top_n_stock_avg_price_change(n):
-    """
-    计算前 n% 成交金额的股票的平均涨幅。
-
-    该函数获取A股的实时交易数据，将股票按成交金额降序排序，并计算总成交金额。
-    然后确定构成前 n% 成交金额的股票数量，并计算这些股票的平均涨幅。
-
-    参数:
-        n (float): 要计算的股票百分比。
-
-    返回:
-        float: 前 n% 成交金额的股票的平均涨幅。如果数据为空，则返回0。
-    """
-    # 获取 A 股实时行情数据
-    # 序号	代码	名称	最新价	涨跌幅	涨跌额	成交量	成交额	振幅	最高	...	量比	换手率	市盈率-动态	市净率	总市值	流通市值	涨速	5分钟涨跌	60日涨跌幅	年初至今涨跌幅
-    df = ak.stock_zh_a_spot_em()
-    if df.empty:
-        logger.info("实时行情数据为空，无法计算平均涨幅")
-        return 0
-
-    # 按成交金额降序排序
-    df_sorted = df.sort_values("成交额", ascending=False)
-
-    # 计算前 n% 的股票数量
-    num_stocks = len(df)
-    top_n_percent = int(num_stocks * (n / 100))
-
-    # 计算前 n% 股票的加权平均涨幅
-    top_n_weighted_avg_price_change = (
-        df_sorted["涨跌幅"].head(top_n_percent)
-        * df_sorted["总市值"].head(top_n_percent)
-    ).sum() / df_sorted["总市值"].head(top_n_percent).sum()
-
-    # 计算前 n% 股票的算数平均涨幅，去除涨幅超过31%的股票
-    top_n_avg_price_change = (
-        df_sorted[df_sorted["涨跌幅"] < 31]["涨跌幅"].head(top_n_percent).mean()
-    )
-
-    logger.info(f"前 {n}% 成交金额的股票的平均涨幅为: {top_n_avg_price_change:.2f}%")
-
-    return top_n_weighted_avg_price_change, top_n_avg_price_change
-
-
-@st.cache_data(ttl=180)
-def top_n_stock_amount_percent(n):
+@tracked_cache_data(ttl=180)
+def get_market_breadth(top_percent=5, top_n=10) -> MarketBreadth:
     """
-    计算前 n% 的股票对总成交量的贡献百分比。
-
-    该函数获取A股的实时交易数据，将股票按成交量降序排序，并计算总成交量。
-    然后确定构成前 n% 成交量的股票数量，并计算这些股票的总成交量。
-    最后，计算前 n% 的股票对总成交量的贡献百分比。
+    获取一次 A 股实时快照，并在同一次遍历中计算全部市场宽度指标。
 
     参数:
-        n (float): 要计算的股票百分比。
+        top_percent (float): 成交额/成交量前 top_percent% 的股票用于计算拥挤度和平均涨幅
+        top_n (int): 成交额前 top_n 的股票用于计算活跃股票和平均市值
 
     返回:
-        float: 前 n% 的股票对总成交量的贡献百分比。如果总成交量为零，则返回0。
+        MarketBreadth: 市场宽度指标。
     """
-
-    # 获取 A 股实时行情数据
-    df = ak.stock_zh_a_spot_em()
-    # 按成交量降序排序
-    df_sorted = df.sort_values("成交量", ascending=False)
-
-    # 计算前 n% 的股票数量
-    num_stocks = len(df)
-    top_n_percent = int(num_stocks * (n / 100))
-
-    # 计算总成交量
-    total_amount = df["成交量"].sum()
-
-    if total_amount == 0:
-        logger.info("总成交量为0, 可能是盘前，无法计算拥挤度")
-        return 0
-
-    # 计算前 n% 股票的成交量总和
-    top_n_percent_amount = df_sorted["成交量"].head(top_n_percent).sum()
-
-    # 计算拥挤度
-    crowdedness = top_n_percent_amount / total_amount
-    logger.info(f"前 {n}% 成交量的股票占总成交量的 {crowdedness*100:.2f}%")
-
-    return crowdedness
+    return compute_market_breadth(ak.stock_zh_a_spot_em(), top_percent, top_n)
 
 
 # 简单的预测模型
@@ -533,208 +320,241 @@ def streamlit_options(etf):
     st.write(f"隐含波动率: {closest_option['隐含波动率']:.2f}%")
 
 
-@st.cache_data(ttl=180)
-def get_top_n_popular_stocks(n):
-    """
-    获取成交额前 N 的股票详细信息和统计数据。
+def format_top_stocks(top_stocks):
+    """把成交额前 N 的股票整理成展示用的 DataFrame。"""
+    # 选择需要的列并重命名
+    result_df = top_stocks[
+        ["代码", "名称", "最新价", "涨跌幅", "成交额", "总市值", "换手率"]
+    ].copy()
 
-    参数:
-        n (int): 获取前 N 只股票的信息
-
-    返回:
-        df: 包含前 N 只股票的详细信息和统计数据的 DataFrame。
-    """
-    try:
-        # 获取 A 股实时行情数据
-        df = ak.stock_zh_a_spot_em()
-        if df.empty:
-            logger.info("实时行情数据为空")
-            return None
-
-        # 按成交额降序排序
-        df_sorted = df.sort_values("成交额", ascending=False)
+    # 格式化数值
+    result_df["涨跌幅"] = result_df["涨跌幅"].apply(lambda x: f"{x:.2f}%")
+    result_df["换手率"] = result_df["换手率"].apply(lambda x: f"{x:.2f}%")
+    result_df["成交额"] = (result_df["成交额"] / 1e8).apply(lambda x: f"{int(x)}亿")
+    result_df["总市值"] = (result_df["总市值"] / 1e8).apply(lambda x: f"{int(x)}亿")
+    result_df["最新价"] = result_df["最新价"].apply(lambda x: f"{x:.2f}")
 
-        # 获取前 N 只股票
-        top_n_stocks = df_sorted.head(n).copy()
+    # 设置索引为名称，但不显示索引名
+    result_df.set_index("名称", inplace=True)
 
-        # 选择需要的列并重命名
-        result_df = top_n_stocks[
-            ["代码", "名称", "最新价", "涨跌幅", "成交额", "总市值", "换手率"]
-        ].copy()
+    return result_df
 
-        # 格式化数值
-        result_df["涨跌幅"] = result_df["涨跌幅"].apply(lambda x: f"{x:.2f}%")
-        result_df["换手率"] = result_df["换手率"].apply(lambda x: f"{x:.2f}%")
-        result_df["成交额"] = (result_df["成交额"] / 1e8).apply(lambda x: f"{int(x)}亿")
-        result_df["总市值"] = (result_df["总市值"] / 1e8).apply(lambda x: f"{int(x)}亿")
-        result_df["最新价"] = result_df["最新价"].apply(lambda x: f"{x:.2f}")
 
-        # 设置索引为名称，但不显示索引名
-        result_df.set_index("名称", inplace=True)
+# 计算 5 日均额的指数日线
+AVG_AMOUNT_SYMBOLS = ("sh000001", "sz399001")
 
-        return result_df
 
-    except Exception as e:
-        logger.error(f"获取股票信息时发生错误：{str(e)}")
-        return None
-
-
-@st.cache_data(ttl=180)
-def calculate_top_n_stocks_avg_market_value(n):
+def build_market_heat_plan():
     """
-    计算成交额前N的股票的平均市值。
-
-    参数:
-        n (int): 要计算的股票数量
+    get_market_heat 需要的上游数据，并发获取。
 
-    返回:
-        tuple: (avg_market_value, total_market_value, stocks_count)
-        - avg_market_value: 平均市值（亿元）
-        - total_market_value: 总市值（亿元）
-        - stocks_count: 实际统计的股票数量
+    每个指数板块、每个指数的日线各是一个任务，指数快照和 5 日均额通过 deps
+    等到它们都完成后再组合。
     """
-    try:
-        logger.info(f"开始计算前{n}只股票的平均市值")
-        df = ak.stock_zh_a_spot_em()
-
-        if df.empty:
-            logger.warning("获取到的股票数据为空")
-            return 0, 0, 0
-
-        # 按成交额降序排序并获取前N只
-        df_sorted = df.sort_values("成交额", ascending=False).head(n)
-
-        # 计算市值（转换为亿元）
-        total_market_value = df_sorted["总市值"].sum() / 1e8
-        avg_market_value = df_sorted["总市值"].mean() / 1e8
-        stocks_count = len(df_sorted)
+    today = datetime.now(pytz.timezone("Asia/Shanghai")).date()
+    plan = FetchPlan(max_workers=8, timeout=20)
+
+    boards = []
+    for board in INDEX_BOARDS:
+        boards.append(f"index_board:{board}")
+        plan.add(boards[-1], lambda board=board: fetch_index_board(ak, board))
+    plan.add(
+        "index_snapshot", lambda *frames: IndexSpotSnapshot.from_frames(frames), deps=boards
+    )
 
-        logger.info(f"前{stocks_count}只股票平均市值: {avg_market_value:.2f}亿")
-        logger.info(f"前{stocks_count}只股票总市值: {total_market_value:.2f}亿")
+    dailies = []
+    for symbol in AVG_AMOUNT_SYMBOLS:
+        dailies.append(f"index_daily:{symbol}")
+        plan.add(dailies[-1], lambda symbol=symbol: get_index_daily(symbol))
+    plan.add(
+        "avg_5_day", lambda sh, sz: n_day_avg_amount(5, sh, sz), deps=dailies, default=0
+    )
 
-        return avg_market_value, total_market_value, stocks_count
-    except Exception as e:
-        logger.error(f"计算平均市值时发生错误: {str(e)}")
-        return 0, 0, 0
+    return (
+        plan.add("breadth", get_market_breadth, default=MarketBreadth.empty())
+        .add("amount_curve", get_amount_profiles)
+        .add("is_trade_date", lambda: is_trade_date(today), default=False)
+    )
 
 
-def get_market_heat():
+def get_market_heat() -> MarketHeat:
     logger.info("程序启动")
-    # Streamlit 页面设置
+    # 并发获取所有上游数据，之后的计算都命中 st.cache_data
+    fetched = build_market_heat_plan().run()
 
     # 获取当前成交额
     logger.info("开始获取当前成交额")
-    sh_amount, sz_amount = get_a_amount()
+    snapshot = fetched["index_snapshot"]
+    sh_amount, sz_amount = get_a_amount(snapshot) if fetched.ok("index_snapshot") else (0, 0)
 
     # 当前时间
     current_time = datetime.now()
 
-    # 预测成交额
-    sh_pred = predict_amount(sh_amount, current_time)
-    sz_pred = predict_amount(sz_amount, current_time)
+    # 预测成交额，分时曲线获取失败时不预测
+    if fetched.ok("amount_curve"):
+        sh_pred = predict_amount(sh_amount, current_time)
+        sz_pred = predict_amount(sz_amount, current_time)
+    else:
+        sh_pred = sz_pred = None
 
     # 计算总成交额和预测总成交额
     total_amount = sh_amount + sz_amount or 1  # Use 1 if total_amount is 0
-    total_pred = sh_pred + sz_pred
+    total_pred = sh_pred + sz_pred if sh_pred is not None else None
+
+    def index_amount(symbol):
+        # 指数行情获取失败或缺少该指数时按 0 计
+        try:
+            return get_index_amount(symbol, snapshot) if fetched.ok("index_snapshot") else 0
+        except Exception:
+            return 0
 
     # 创业板成交占比（散户跟风指标）
-    cyb_amount = get_index_amount("399006")
+    cyb_amount = index_amount("399006")
 
     # 计算创业板成交占总成交比例
     cyb_ratio = cyb_amount / total_amount * 100
 
     # 沪深 300 成交占比
-    hs300_amount = get_index_amount("000300")
+    hs300_amount = index_amount("000300")
     hs300_ratio = hs300_amount / total_amount * 100
 
     # 中证 1000 成交占比
-    zz1000_amount = get_index_amount("000852")
+    zz1000_amount = index_amount("000852")
     zz1000_ratio = zz1000_amount / total_amount * 100
 
     # 中证 2000 成交占比
-    zz2000_amount = get_index_amount("932000")
+    zz2000_amount = index_amount("932000")
     zz2000_ratio = zz2000_amount / total_amount * 100
 
     # 获取5日均值
-    avg_5_day = get_n_day_avg_amount(5)
+    avg_5_day = fetched["avg_5_day"]
+
+    # 市场宽度指标：一次快照，一次遍历
+    breadth = fetched["breadth"]
 
     # 拥挤度，算法参见https://legulegu.com/stockdata/ashares-congestion
-    crowdedness = top_n_stock_amount_percent(5) * 100
+    crowdedness = breadth.crowdedness * 100
 
     # 中间股票涨幅
-    middle_price_change_value = middle_price_change()
+    middle_price_change_value = breadth.median_change
 
     # top5 成交额股票平均涨幅和加权平均涨幅
-    top5_weighted_avg_price_change, top5_avg_price_change = (
-        top_n_stock_avg_price_change(5)
-    )
+    top5_weighted_avg_price_change = breadth.top_weighted_change
+    top5_avg_price_change = breadth.top_avg_change
     # 股票涨跌比
-    up_down_ratio = stock_up_down_ratio()
+    up_down_ratio = breadth.up_ratio
 
     # 涨停数量
-    limit_up_count = count_limit_up_stocks()
+    limit_up_count = breadth.limit_up_count
     # 跌停数量
-    limit_down_count = count_limit_down_stocks()
-
-    # 计算前10只股票的平均市值
-    avg_market_value, total_market_value, stocks_count = (
-        calculate_top_n_stocks_avg_market_value(10)
+    limit_down_count = breadth.limit_down_count
+
+    # 前10只股票的平均市值
+    avg_market_value = breadth.top_avg_market_value
+    stocks_count = len(breadth.top_stocks)
+    # 前10只活跃股票的详细信息
+    top_stocks = format_top_stocks(breadth.top_stocks) if stocks_count else None
+
+    return MarketHeat(
+        sh_amount=int(sh_amount / 1e8),
+        sz_amount=int(sz_amount / 1e8),
+        cyb_amount=int(cyb_amount / 1e8),
+        total_amount=int(total_amount / 1e8),
+        cyb_ratio=round(cyb_ratio, 2),
+        zz1000_ratio=round(zz1000_ratio, 2),
+        zz2000_ratio=round(zz2000_ratio, 2),
+        hs300_ratio=round(hs300_ratio, 2),
+        predicted_amount=(
+            int(total_pred / 1e8)
+            if total_pred is not None and fetched["is_trade_date"]
+            else None
+        ),
+        avg_5_day=int(avg_5_day / 1e8),
+        crowdedness=round(crowdedness, 2),
+        median_change=round(middle_price_change_value, 2),
+        top5_weighted_change=round(top5_weighted_avg_price_change, 2),
+        top5_avg_change=round(top5_avg_price_change, 2),
+        up_ratio=round(up_down_ratio, 2),
+        limit_up_count=limit_up_count,
+        limit_down_count=limit_down_count,
+        broken_limit_count=breadth.broken_limit_count,
+        near_limit_up_count=breadth.near_limit_up_count,
+        near_limit_down_count=breadth.near_limit_down_count,
+        top_stocks_count=stocks_count,
+        top_avg_market_value=int(avg_market_value),
+        top_stocks=top_stocks,
+        breadth=breadth,
+        missing=tuple(sorted(fetched.errors)),
     )
-    # 显示前10只活跃股票的详细信息
-    top_stocks = get_top_n_popular_stocks(10)
-
-    # 创建数据字典
-    data = {
-        "指标": [
-            "上证成交额",
-            "深证成交额",
-            "创业板成交额",
-            "当前总成交额",
-            "创业板成交占总成交比例",
-            "中证 1000 成交占总成交比例",
-            "中证 2000 成交占总成交比例",
-            "沪深 300 成交占总成交比例",
-            "预计今日总成交额",
-            "5日均值",
-            "交易拥挤度",
-            "中位数股票涨幅",
-            "前 5% 成交加权涨幅",
-            "前 5% 成交算数涨幅",
-            "股票上涨百分比",
-            "涨停板股票数量",
-            "跌停板股票数量",
-            f"前{stocks_count}大成交额股票平均市值",
-            f"前{stocks_count}大成交额股票活跃度",
-        ],
-        "数值": [
-            int(sh_amount / 1e8),  # 上证成交额（亿）
-            int(sz_amount / 1e8),  # 深证成交额（亿）
-            int(cyb_amount / 1e8),  # 创业板成交额（亿）
-            int(total_amount / 1e8),  # 当前总成交额（亿）
-            round(cyb_ratio, 2),  # 创业板成交占比（%）
-            round(zz1000_ratio, 2),  # 中证1000成交占比（%）
-            round(zz2000_ratio, 2),  # 中证2000成交占比（%）
-            round(hs300_ratio, 2),  # 沪深300成交占比（%）
-            # 预计今日总成交额（亿）
-            (
-                int(total_pred / 1e8)
-                if is_trade_date(datetime.now(pytz.timezone("Asia/Shanghai")).date())
-                else None
-            ),
-            int(avg_5_day / 1e8),  # 5日均值（亿）
-            round(crowdedness, 2),  # 交易拥挤度
-            round(middle_price_change_value, 2),  # 中位数股票涨幅（%）
-            round(top5_weighted_avg_price_change, 2),  # 前5%成交加权涨幅（%）
-            round(top5_avg_price_change, 2),  # 前5%成交算数涨幅（%）
-            round(up_down_ratio, 2),  # 股票上涨百分比（%）
-            limit_up_count,  # 涨停板股票数量
-            limit_down_count,  # 跌停板股票数量
-            int(avg_market_value),  # 前N大成交额股票平均市值（亿）
-            top_stocks,  # 前N大成交额股票活跃度
-        ],
-    }
-
-    return data
+
+
+def clear_snapshot_caches():
+    """后台刷新前清掉由实时行情派生的 st.cache_data，上游频率仍由 CacheWrapper 的 TTL 控制。"""
+    get_index_snapshot.clear()
+    get_market_breadth.clear()
+
+
+# 盘中按分钟记录历史的看板指标（MarketHeat 字段名）
+HISTORY_METRICS = (
+    "predicted_amount",
+    "crowdedness",
+    "up_ratio",
+    "limit_up_count",
+    "limit_down_count",
+    "median_change",
+)
+
+
+def build_market_heat(history: MetricRingBuffer, flow: FlowTracker) -> MarketHeat:
+    """计算看板指标，写入盘中历史和个股成交增量，并附上它们的只读副本。"""
+    heat = get_market_heat()
+    now = datetime.now(pytz.timezone("Asia/Shanghai"))
+    history.append(now, heat.metric_vector(HISTORY_METRICS))
+
+    # 实时行情已在 get_market_heat 中获取，这里命中 CacheWrapper 缓存；
+    # 间隔按行情实际的抓取时间记录，而不是本次后台刷新的时间
+    try:
+        spot = ak.stock_zh_a_spot_em()
+        spot_age = ak.entry_age("stock_zh_a_spot_em") or 0.0
+        flow.update(spot, now - timedelta(seconds=spot_age))
+    except Exception as e:
+        logger.warning(f"更新个股成交增量失败：{str(e)}")
+    return replace(heat, history=history.frame(), flow=flow.window())
+
+
+@st.cache_resource
+def get_snapshot_daemon() -> SnapshotDaemon:
+    """每个服务进程一个的后台刷新线程。"""
+    history = MetricRingBuffer(HISTORY_METRICS)
+    flow = FlowTracker()
+    return SnapshotDaemon(
+        lambda: build_market_heat(history, flow),
+        interval=60,
+        before_refresh=clear_snapshot_caches,
+    ).start()
+
+
+def sparkline(history: pd.DataFrame, *metrics):
+    """指标卡片下方的盘中走势，至少两个点时才显示。"""
+    if len(history) > 1:
+        st.line_chart(
+            history[list(metrics)].rename(columns=LABELS), height=100
+        )
+
+
+def read_market_heat() -> MarketSnapshot:
+    """读取后台线程发布的最新快照，只有进程冷启动时才等待第一份快照，刷新失败时立即报错。"""
+    daemon = get_snapshot_daemon()
+    snapshot = daemon.latest()
+    if snapshot is None:
+        with st.spinner("正在获取行情数据..."):
+            snapshot = daemon.wait_for_first(timeout=60)
+    if snapshot is None:
+        if daemon.last_error is not None:
+            raise RuntimeError(f"行情快照尚未就绪：{str(daemon.last_error)}")
+        raise RuntimeError("行情快照尚未就绪")
+    return snapshot
+
 
 def color_negative_red(val):
     try:
@@ -746,16 +566,16 @@ def color_negative_red(val):
 
 
 def streamlit_market_heat():
-    data = get_market_heat()
+    heat = read_market_heat().data
 
     # 成交额指标
     st.header("成交额")
-    for item, value in zip(data["指标"][0:10], data["数值"][0:10]):
+    for item, value in heat.items(AMOUNT_LABELS):
         st.write(f"{item}: {value}")
 
     # 情绪指标
     st.header("情绪指标")
-    for item, value in zip(data["指标"][10:17], data["数值"][10:17]):
+    for item, value in heat.items(SENTIMENT_LABELS):
         st.write(f"{item}: {value}")
 
     # 清除缓存按钮
@@ -765,6 +585,32 @@ def streamlit_market_heat():
         st.success("缓存已清除")
 
 
+def streamlit_flow(flow: FlowWindow):
+    """近 N 分钟成交额排行和成交加速筛选，数据来自连续实时行情快照的差分。"""
+    st.markdown("### ⏱️ 盘中资金流向")
+    if len(flow.times) < 2:
+        st.info("盘中累计两次以上行情刷新后显示近 N 分钟成交额排行。")
+        return
+
+    # 实时行情约 3 分钟刷新一次，更短的窗口没有意义
+    minutes = st.select_slider("统计最近分钟数", options=[5, 10, 15, 30], value=5)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"#### 近 {minutes} 分钟成交额排行")
+        leaders = flow.leaderboard(minutes, top=20)
+        if not leaders.empty:
+            leaders[f"近{minutes}分钟成交额"] = leaders[f"近{minutes}分钟成交额"] / 1e8
+            leaders["占全市场比例"] = leaders["占全市场比例"] * 100
+        st.dataframe(leaders, use_container_width=True, hide_index=True)
+    with col2:
+        st.markdown(f"#### 成交加速（近 {minutes} 分钟 vs 之前 30 分钟）")
+        accelerating = flow.acceleration(minutes, baseline_minutes=30, top=20)
+        if accelerating.empty:
+            st.info("历史间隔不足，暂无法计算成交加速。")
+        else:
+            st.dataframe(accelerating, use_container_width=True, hide_index=True)
+
+
 def streamlit_spread_chart():
     st.markdown("### 📈 指数40日收益差分析")
 
@@ -802,17 +648,31 @@ def streamlit_app():
             st.markdown("### 🎯 市场成交与情绪分析")
 
         try:
-            data = get_market_heat()
+            snapshot = read_market_heat()
         except Exception:
             st.error("开盘期间，无法获取数据，请稍后刷新。")
             return
+        heat = snapshot.data
+        updated_at = datetime.fromtimestamp(
+            snapshot.fetched_at, pytz.timezone("Asia/Shanghai")
+        )
+        with col2:
+            st.caption(f"数据版本 v{snapshot.version}，更新于 {updated_at:%H:%M:%S}")
+
+        # 按条目自身的 TTL 判断：休市期间行情本来就有效到下一次开盘
+        spot_overdue = ak.entry_overdue("stock_zh_a_spot_em")
+        if spot_overdue is not None and spot_overdue > ak.cache_time:
+            spot_age = ak.entry_age("stock_zh_a_spot_em")
+            st.warning(f"行情接口暂时不可用，当前显示 {int(spot_age // 60)} 分钟前的数据。")
+        if heat.missing:
+            st.warning(f"部分数据获取失败：{', '.join(heat.missing)}，相关指标暂不可用。")
 
         # 使用多列布局显示主要指标
         metrics_col1, metrics_col2, metrics_col3, metrics_col4 = st.columns(4)
 
         with metrics_col1:
-            avg_amount = data["数值"][9]  # 5日均值（亿）
-            pred_amount = data["数值"][8]  # 预估成交额（亿）
+            avg_amount = heat.avg_5_day  # 5日均值（亿）
+            pred_amount = heat.predicted_amount  # 预估成交额（亿）
 
             # 预估成交额指标
             if pred_amount is not None:
@@ -824,29 +684,37 @@ def streamlit_app():
                     delta=f"{delta_vs_avg:+,}亿 vs 5日均值",
                     delta_color=delta_color,
                 )
+            sparkline(heat.history, "predicted_amount")
 
         with metrics_col2:
-            up_ratio = data["数值"][14]  # 上涨占比（%）
+            up_ratio = heat.up_ratio  # 上涨占比（%）
             st.metric("上涨占比", f"{up_ratio:.1f}%")
+            sparkline(heat.history, "up_ratio")
 
         with metrics_col3:
-            limit_up = data["数值"][15]  # 涨停数量
-            limit_down = data["数值"][16]  # 跌停数量
+            limit_up = heat.limit_up_count  # 涨停数量
+            limit_down = heat.limit_down_count  # 跌停数量
             st.metric(
                 "涨停数量",
                 str(limit_up),
                 delta=f"-跌停 {limit_down}",
                 delta_color="inverse",
             )
+            broken = heat.broken_limit_count  # 炸板数量
+            near_up = heat.near_limit_up_count  # 接近涨停数量
+            near_down = heat.near_limit_down_count  # 接近跌停数量
+            st.caption(f"炸板 {broken} · 接近涨停 {near_up} · 接近跌停 {near_down}")
+            sparkline(heat.history, "limit_up_count", "limit_down_count")
 
         with metrics_col4:
-            middle_change = data["数值"][11]  # 中位数涨幅（%）
+            middle_change = heat.median_change  # 中位数涨幅（%）
             st.metric(
                 "中位数涨幅",
                 f"{middle_change:.2f}%",
                 delta=None,
                 delta_color="inverse" if middle_change > 0 else "normal",
             )
+            sparkline(heat.history, "median_change")
 
         # 分两列显示详细数据
         col1, col2 = st.columns(2)
@@ -913,16 +781,16 @@ def streamlit_app():
             st.markdown("#### 💰 指数成交占比")
 
             # 总成交额（亿）
-            total = data["数值"][3]
+            total = heat.total_amount
 
             # 定义指数数据
             indices = [
-                ("上证指数", data["数值"][0]),
-                ("深证指数", data["数值"][1]),
-                ("创业板", data["数值"][2]),
-                ("中证1000", data["数值"][5] * total / 100),  # 转换百分比为实际值
-                ("中证2000", data["数值"][6] * total / 100),  # 转换百分比为实际值
-                ("沪深300", data["数值"][7] * total / 100),  # 转换百分比为实际值
+                ("上证指数", heat.sh_amount),
+                ("深证指数", heat.sz_amount),
+                ("创业板", heat.cyb_amount),
+                ("中证1000", heat.zz1000_ratio * total / 100),  # 转换百分比为实际值
+                ("中证2000", heat.zz2000_ratio * total / 100),  # 转换百分比为实际值
+                ("沪深300", heat.hs300_ratio * total / 100),  # 转换百分比为实际值
             ]
 
             # 显示各指数进度条
@@ -946,13 +814,13 @@ def streamlit_app():
             # 显示总成交额和5日均值
             cols = st.columns(2)
             with cols[0]:
-                st.info(f"**总成交额**: {data['数值'][3]} 亿")
+                st.info(f"**总成交额**: {heat.total_amount} 亿")
             with cols[1]:
-                st.info(f"**5日均值**: {data['数值'][9]} 亿")
+                st.info(f"**5日均值**: {heat.avg_5_day} 亿")
 
         with col2:
             st.markdown("#### 💡 情绪指标")
-            for item, value in zip(data["指标"][10:17], data["数值"][10:17]):
+            for item, value in heat.items(SENTIMENT_LABELS):
                 # 处理带颜色标记的值
                 output = f"**{item}**: {value}"
                 # More Pythonic way to check for specific substrings
@@ -963,15 +831,34 @@ def streamlit_app():
                 else:
                     st.error(output)
 
+        with st.expander("📶 市场宽度分布"):
+            breadth = heat.breadth
+            dist_col1, dist_col2 = st.columns(2)
+            with dist_col1:
+                st.markdown("**涨跌幅分位数（%）**")
+                st.bar_chart(
+                    pd.Series(
+                        list(breadth.change_quantiles.values()),
+                        index=[f"{round(q * 100)}%" for q in breadth.change_quantiles],
+                        dtype=float,
+                    )
+                )
+            with dist_col2:
+                st.markdown("**成交量拥挤度**")
+                for cutoff, share in breadth.crowdedness_by_cutoff.items():
+                    st.write(f"前 {cutoff:g}% 成交量股票占比: {share * 100:.2f}%")
+                sparkline(heat.history, "crowdedness")
+
     with tab2:
         # 第二个tab显示龙头股分析
         st.markdown("### 🔥 龙头股活跃度分析")
-        data = get_market_heat()
 
         # 显示平均市值
-        st.info(f"#### 📊 {data['指标'][17]}\n{data['数值'][17]}")
+        st.info(
+            f"#### 📊 前{heat.top_stocks_count}大成交额股票平均市值\n{heat.top_avg_market_value}"
+        )
 
-        if data["数值"][18] is not None:
+        if heat.top_stocks is not None:
             # 增加过滤和排序选项
             col1, col2 = st.columns([2, 2])
             with col1:
@@ -980,7 +867,7 @@ def streamlit_app():
                 )
 
             # 获取原始DataFrame
-            df = data["数值"][18]
+            df = heat.top_stocks
 
             # 根据选择的列进行排序
             if sort_by == "涨跌幅":
@@ -1029,6 +916,8 @@ def streamlit_app():
                 styled_df, use_container_width=True, height=400, hide_index=False
             )
 
+        streamlit_flow(heat.flow)
+
     with tab3:
         # 第三个tab显示指数收益差分析
         streamlit_spread_chart()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from stockview.breadth import MarketBreadth
+from stockview.flow import FlowWindow
+
+# 字段 -> 展示名称，顺序即面板中的显示顺序
+AMOUNT_LABELS = {
+    "sh_amount": "上证成交额",
+    "sz_amount": "深证成交额",
+    "cyb_amount": "创业板成交额",
+    "total_amount": "当前总成交额",
+    "cyb_ratio": "创业板成交占总成交比例",
+    "zz1000_ratio": "中证 1000 成交占总成交比例",
+    "zz2000_ratio": "中证 2000 成交占总成交比例",
+    "hs300_ratio": "沪深 300 成交占总成交比例",
+    "predicted_amount": "预计今日总成交额",
+    "avg_5_day": "5日均值",
+}
+SENTIMENT_LABELS = {
+    "crowdedness": "交易拥挤度",
+    "median_change": "中位数股票涨幅",
+    "top5_weighted_change": "前 5% 成交加权涨幅",
+    "top5_avg_change": "前 5% 成交算数涨幅",
+    "up_ratio": "股票上涨百分比",
+    "limit_up_count": "涨停板股票数量",
+    "limit_down_count": "跌停板股票数量",
+}
+LIMIT_LABELS = {
+    "broken_limit_count": "炸板股票数量",
+    "near_limit_up_count": "接近涨停股票数量",
+    "near_limit_down_count": "接近跌停股票数量",
+}
+LABELS = {**AMOUNT_LABELS, **SENTIMENT_LABELS, **LIMIT_LABELS}
+
+
+@dataclass(frozen=True, eq=False)
+class MarketHeat:
+    """
+    一次刷新计算出的综合面板指标。
+
+    成交额单位为亿，比例和涨幅单位为 %。每个字段有名字，各标签页直接读取字段，
+    新增指标不会改变其他指标的位置。
+    """
+
+    sh_amount: int
+    sz_amount: int
+    cyb_amount: int
+    total_amount: int
+    cyb_ratio: float
+    zz1000_ratio: float
+    zz2000_ratio: float
+    hs300_ratio: float
+    predicted_amount: int | None  # 非交易日或分时曲线缺失时为 None
+    avg_5_day: int
+    crowdedness: float
+    median_change: float
+    top5_weighted_change: float
+    top5_avg_change: float
+    up_ratio: float
+    limit_up_count: int
+    limit_down_count: int
+    broken_limit_count: int
+    near_limit_up_count: int
+    near_limit_down_count: int
+    top_stocks_count: int
+    top_avg_market_value: int
+    top_stocks: pd.DataFrame | None
+    breadth: MarketBreadth
+    missing: tuple[str, ...] = ()  # 获取失败、已按默认值降级的输入
+    history: pd.DataFrame = field(default_factory=pd.DataFrame)
+    flow: FlowWindow = field(default_factory=FlowWindow.empty)
+
+    def items(self, labels) -> list[tuple[str, object]]:
+        """按 labels 的顺序返回 (展示名称, 数值)。"""
+        return [(label, getattr(self, name)) for name, label in labels.items()]
+
+    def metric_vector(self, names) -> list[float | None]:
+        return [getattr(self, name) for name in names]
+
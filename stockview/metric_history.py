@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import os
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from stockview.akcache.disk import atomic_write
+from stockview.helpers import market_time_helper
+from stockview.log import logger
+
+# 每个交易分钟一个槽位：上午 9:30-11:30 为 0-119，下午 13:00-15:00 为 120-239
+SESSION_MINUTES = 240
+MORNING_MINUTES = 120
+
+
+def slot_label(slot: int) -> str:
+    """槽位对应的时刻，例如 0 -> 09:30，120 -> 13:00。"""
+    if slot < MORNING_MINUTES:
+        start, offset = datetime(2000, 1, 1, 9, 30), slot
+    else:
+        start, offset = datetime(2000, 1, 1, 13, 0), slot - MORNING_MINUTES
+    return f"{start + timedelta(minutes=offset):%H:%M}"
+
+
+class MetricRingBuffer:
+    """
+    盘中看板指标的分钟级历史。
+
+    (SESSION_MINUTES, 指标数) 的 NumPy 数组，每个交易分钟一个槽位，同一分钟内多次刷新
+    覆盖同一槽位；新交易日的第一次写入清空所有槽位。追加和读取都不需要重新分配内存。
+
+    directory（默认 STOCKVIEW_CACHE_DIR/metrics）不为空时，每 save_every 个新槽位、午休
+    和收盘时写入 .npz，进程在盘中重启后恢复当天已有的历史。
+    """
+
+    def __init__(
+        self,
+        metrics,
+        slots=SESSION_MINUTES,
+        directory=None,
+        save_every=15,
+        market_time=market_time_helper,
+    ):
+        self.metrics = tuple(metrics)
+        self.slots = slots
+        self.save_every = save_every
+        self.market_time = market_time
+        self.values = np.full((slots, len(self.metrics)), np.nan)
+        self.filled = np.zeros(slots, dtype=bool)
+        self.day: date | None = None
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        if directory is None and os.environ.get("STOCKVIEW_CACHE_DIR"):
+            directory = Path(os.environ["STOCKVIEW_CACHE_DIR"]) / "metrics"
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.load()
+
+    @property
+    def path(self) -> Path | None:
+        if self.directory is None:
+            return None
+        return self.directory / "intraday_metrics.npz"
+
+    def slot_for(self, now: datetime) -> int | None:
+        """当前时刻对应的槽位，非交易日、午休和盘前盘后返回 None。"""
+        if not self.market_time.in_trading_session(now):
+            return None
+        minutes = self.market_time.minutes_since_market_open(now)
+        return min(minutes, self.slots - 1)
+
+    def append(self, now: datetime, values) -> bool:
+        """
+        写入一次刷新的指标向量（按 metrics 的顺序），非交易时段时只做持久化。
+
+        只有交易日的连续竞价时段才会分配槽位，所以周末、节假日的刷新不会清空上一个
+        交易日的历史，也不会覆盖已经保存的文件。
+        """
+        now = now.astimezone(self.market_time.tz)
+        slot = self.slot_for(now)
+        if slot is None:
+            self.flush()
+            return False
+
+        vector = np.asarray(
+            [np.nan if value is None else value for value in values], dtype=float
+        )
+        with self._lock:
+            if self.day != now.date():
+                self.values.fill(np.nan)
+                self.filled.fill(False)
+                self.day = now.date()
+            if not self.filled[slot]:
+                self._unsaved += 1
+            self.values[slot] = vector
+            self.filled[slot] = True
+            should_save = self._unsaved >= self.save_every or slot == MORNING_MINUTES
+        if should_save:
+            self.flush()
+        return True
+
+    def frame(self) -> pd.DataFrame:
+        """当天已有的历史，按时刻索引，返回副本。"""
+        with self._lock:
+            slots = np.flatnonzero(self.filled)
+            values = self.values[slots].copy()
+        return pd.DataFrame(
+            values, index=[slot_label(int(slot)) for slot in slots], columns=self.metrics
+        )
+
+    def flush(self):
+        """有未保存的槽位时写入磁盘。"""
+        if self.path is None or self._unsaved == 0:
+            return
+        with self._lock:
+            values = self.values.copy()
+            filled = self.filled.copy()
+            day = self.day.isoformat() if self.day else ""
+            self._unsaved = 0
+
+        def write(path):
+            # 传文件对象，避免 np.savez 给临时文件名追加 .npz
+            with open(path, "wb") as f:
+                np.savez(
+                    f,
+                    values=values,
+                    filled=filled,
+                    day=np.array(day),
+                    metrics=np.array(self.metrics),
+                )
+
+        try:
+            atomic_write(self.path, write)
+        except Exception as e:
+            logger.warning(f"保存盘中指标历史失败：{str(e)}")
+
+    def load(self):
+        """恢复当天的历史；非交易日恢复最近一次保存的交易日历史。日期或指标不一致时忽略。"""
+        try:
+            with np.load(self.path, allow_pickle=False) as saved:
+                day = str(saved["day"])
+                metrics = tuple(str(name) for name in saved["metrics"])
+                values, filled = saved["values"], saved["filled"]
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"读取盘中指标历史 {self.path} 失败：{str(e)}")
+            return
+
+        today = datetime.now(self.market_time.tz).date()
+        if not day or metrics != self.metrics or values.shape != self.values.shape:
+            return
+        if day != today.isoformat() and self.market_time.is_trading_day(today):
+            return
+        with self._lock:
+            self.values[:] = values
+            self.filled[:] = filled
+            self.day = date.fromisoformat(day)
+        logger.info(f"恢复盘中指标历史 {int(filled.sum())} 个分钟")
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+
+EUCLIDEAN = "euclidean"
+MAHALANOBIS = "mahalanobis"
+
+
+def smallest_k_order(values: np.ndarray, k: int) -> np.ndarray:
+    """
+    values 中最小的 k 个元素的位置，按 (值, 位置) 升序，与 DataFrame.nsmallest(keep="first") 一致。
+
+    先用 np.partition 找到第 k 小的值，严格小于它的全部入选，等于它的按位置先后补足，
+    所以边界上的并列不会因为 argpartition 的任意选择而改变结果。NaN 不参与排序。
+    """
+    positions = np.flatnonzero(~np.isnan(values))
+    finite = values[positions]
+    if k <= 0 or len(finite) == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(finite):
+        kth = np.partition(finite, k - 1)[k - 1]
+        below = np.flatnonzero(finite < kth)
+        ties = np.flatnonzero(finite == kth)[: k - len(below)]
+        chosen = np.concatenate([below, ties])
+    else:
+        chosen = np.arange(len(finite))
+    chosen = chosen[np.lexsort((chosen, finite[chosen]))]
+    return positions[chosen]
+
+
+@dataclass(frozen=True, eq=False)
+class FeatureSpace:
+    """
+    历史状态的特征矩阵（行 = 交易日，列 = 特征），C 连续的 float64 数组。
+
+    weights 为每个特征的权重，乘在平方差上；metric 为 mahalanobis 时使用特征协方差矩阵的
+    伪逆，特征之间相关时不会重复计算同一信息。马氏距离对特征缩放不变，不能再加权重。
+    """
+
+    names: tuple[str, ...]
+    matrix: np.ndarray
+    weights: np.ndarray
+    metric: str = EUCLIDEAN
+
+    @classmethod
+    def from_frame(cls, frame, names, weights=None, metric=EUCLIDEAN) -> "FeatureSpace":
+        if metric not in (EUCLIDEAN, MAHALANOBIS):
+            raise ValueError(f"不支持的距离：{metric}")
+        if weights and metric == MAHALANOBIS:
+            raise ValueError("马氏距离不支持特征权重")
+        names = tuple(names)
+        matrix = np.ascontiguousarray(frame[list(names)].to_numpy(dtype=float))
+        weights = weights or {}
+        vector = np.array([float(weights.get(name, 1.0)) for name in names])
+        return cls(names, matrix, vector, metric)
+
+    def differences(self, query, rows=None) -> np.ndarray:
+        """rows（默认全部）与 query 的逐特征差值。"""
+        query = np.asarray([query[name] for name in self.names], dtype=float)
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        return matrix - query
+
+    def contributions(self, query, rows=None) -> np.ndarray:
+        """每个特征的加权平方差，欧氏距离的平方即它们的和。"""
+        return self.differences(query, rows) ** 2 * self.weights
+
+    def distances(self, query) -> np.ndarray:
+        """所有行到 query 的距离，特征含 NaN 的行为 NaN。"""
+        if self.metric == EUCLIDEAN:
+            return np.sqrt(self.contributions(query).sum(axis=1))
+
+        diff = self.differences(query)
+        complete = ~np.isnan(self.matrix).any(axis=1)
+        covariance = np.atleast_2d(np.cov(self.matrix[complete], rowvar=False))
+        inverse = np.linalg.pinv(covariance)
+        squared = np.einsum("ij,jk,ik->i", diff, inverse, diff)
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def causal_neighbors(
+        self, k: int, gap: int, eligible=None, chunk_size: int = 256
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        逐日回测的近邻：第 t 行只在 [0, t - gap] 范围内 eligible 的行中找最近的 k 个。
+
+        按 chunk_size 行一块计算 (块大小, 可用行数) 的距离矩阵，用 np.argpartition 选出
+        每行的 k 个候选再按 (距离, 行号) 排序；第 k 小的距离有并列、可能与
+        smallest_k_order 结果不同的少数行单独重排，保证结果与逐行查询一致。
+
+        返回 (rows, distances)，形状均为 (行数, k)；不足 k 个近邻的位置 rows 为 -1，
+        distances 为 NaN。只支持欧氏距离：马氏距离的协方差会用到查询日之后的数据。
+        """
+        if self.metric != EUCLIDEAN:
+            raise ValueError("逐日回测只支持欧氏距离")
+        n = len(self.matrix)
+        complete = ~np.isnan(self.matrix).any(axis=1)
+        eligible = complete if eligible is None else complete & np.asarray(eligible, dtype=bool)
+        rows = np.full((n, max(k, 0)), -1, dtype=np.int64)
+        distances = np.full((n, max(k, 0)), np.nan)
+
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            limit = stop - gap  # 本块最后一行可用的行数
+            if k <= 0 or limit <= 0:
+                continue
+            queries = np.arange(start, stop)
+            # 与 distances 相同的运算顺序，并列的判断与单次查询一致
+            differences = self.matrix[None, :limit] - self.matrix[start:stop, None]
+            block = np.sqrt((differences**2 * self.weights).sum(axis=2))
+            usable = eligible[None, :limit] & (
+                np.arange(limit)[None, :] <= (queries - gap)[:, None]
+            )
+            usable &= complete[start:stop, None]
+            block[~usable] = np.inf
+
+            count = min(k, limit)
+            picked = np.argpartition(block, count - 1, axis=1)[:, :count]
+            picked_distances = np.take_along_axis(block, picked, axis=1)
+            order = np.lexsort((picked, picked_distances), axis=1)
+            picked = np.take_along_axis(picked, order, axis=1)
+            picked_distances = np.take_along_axis(picked_distances, order, axis=1)
+
+            # 第 k 小的距离有未被选中的并列行时，按行号重新取
+            kth = picked_distances[:, -1:]
+            ambiguous = np.isfinite(kth[:, 0]) & (
+                (block == kth).sum(axis=1) > (picked_distances == kth).sum(axis=1)
+            )
+            for row in np.flatnonzero(ambiguous):
+                chosen = smallest_k_order(np.where(usable[row], block[row], np.nan), count)
+                picked[row, : len(chosen)] = chosen
+                picked_distances[row, : len(chosen)] = block[row, chosen]
+
+            found = np.isfinite(picked_distances)
+            rows[start:stop, :count] = np.where(found, picked, -1)
+            distances[start:stop, :count] = np.where(found, picked_distances, np.nan)
+        return rows, distances
@@ -1,10 +1,10 @@
 import re
 import pandas as pd
 import akshare
-from stockview.akcache import CacheWrapper
+from stockview.akcache import CacheWrapper, akshare_ttl_policy
 from datetime import datetime
 
-ak = CacheWrapper(akshare, cache_time=180)
+ak = CacheWrapper(akshare, cache_time=180, ttl_policy=akshare_ttl_policy)
 
 
 def find_primary_options(etf):
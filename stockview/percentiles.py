@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+import numpy as np
+
+
+def dense_ranks(values: np.ndarray) -> np.ndarray:
+    """
+    每列的稠密排名（相同的值排名相同，从 0 开始），NaN 的排名为行数，排在所有值之后。
+
+    values 形状为 (n, m)，所有列一次排序。
+    """
+    n, m = values.shape
+    order = np.argsort(values, axis=0, kind="stable")
+    ordered = np.take_along_axis(values, order, axis=0)
+    ranks_in_order = np.zeros((n, m), dtype=np.int64)
+    if n > 1:
+        ranks_in_order[1:] = np.cumsum(ordered[1:] != ordered[:-1], axis=0)
+    ranks = np.empty((n, m), dtype=np.int64)
+    np.put_along_axis(ranks, order, ranks_in_order, axis=0)
+    ranks[np.isnan(values)] = n
+    return ranks
+
+
+def _prefix_dominance_counts(ranks: np.ndarray, prefixes: list[np.ndarray]) -> list[np.ndarray]:
+    """
+    对每个前缀长度数组 p（形状 (n,)）计算 #{j < p[t] : ranks[j, c] <= ranks[t, c]}。
+
+    把前缀 [0, p) 按 p 的二进制位拆成若干长度为 2^L 的对齐块；每一层 L 把所有列的
+    (列, 块, 排名) 编码成一个整数键并排序一次，再用 np.searchsorted 批量统计每个查询
+    在对应块中排名不超过自己的元素个数。共 log n 层，总复杂度 O(n m log² (n m))。
+    """
+    n, m = ranks.shape
+    span = n + 1  # 排名取值 0..n
+    rows = np.arange(n)
+    columns = np.arange(m)[None, :]
+    totals = [np.zeros((n, m), dtype=np.int64) for _ in prefixes]
+
+    for level in range(max(n, 1).bit_length()):
+        blocks = (n >> level) + 1
+        keys = ((columns * blocks + (rows >> level)[:, None]) * span + ranks).ravel()
+        keys.sort()
+        for prefix, total in zip(prefixes, totals):
+            active = ((prefix >> level) & 1).astype(bool)
+            if not active.any():
+                continue
+            block = (prefix[active] >> level) - 1
+            base = (columns * blocks + block[:, None]) * span
+            total[active] += np.searchsorted(
+                keys, base + ranks[active], side="right"
+            ) - np.searchsorted(keys, base, side="left")
+    return totals
+
+
+def rolling_percentiles(values, window: int | None = None) -> np.ndarray:
+    """
+    每一行在截至当前（含当前）的历史中的分位数：不超过当前值的个数 / 有效值个数。
+
+    values 为一维或 (n, m) 的二维数组，所有列一次计算；window 为空时使用全部历史
+    （expanding），否则只看最近 window 行（rolling）。NaN 不参与统计，其结果也为 NaN。
+    与逐行 insort + bisect_right 的结果一致，但全部是 NumPy 向量运算。
+    """
+    values = np.asarray(values, dtype=float)
+    one_dimensional = values.ndim == 1
+    if one_dimensional:
+        values = values[:, None]
+    n = len(values)
+    if n == 0:
+        return values.copy()[:, 0] if one_dimensional else values.copy()
+
+    ranks = dense_ranks(values)
+    ends = np.arange(1, n + 1)
+    starts = np.zeros(n, dtype=np.int64) if window is None else np.maximum(ends - window, 0)
+    counts_end, counts_start = _prefix_dominance_counts(ranks, [ends, starts])
+
+    valid = np.concatenate(
+        [np.zeros((1, values.shape[1]), dtype=np.int64), np.cumsum(~np.isnan(values), axis=0)]
+    )
+    sizes = valid[ends] - valid[starts]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = (counts_end - counts_start) / sizes
+    result[np.isnan(values)] = np.nan
+    return result[:, 0] if one_dimensional else result
+
+
+@dataclass(frozen=True, eq=False)
+class PercentileIndex:
+    """
+    历史分位数索引：每列历史值去掉 NaN 后只排序一次，之后的查询都是 np.searchsorted。
+
+    分位数定义与 bisect_right 一致：历史中不超过当前值的个数 / 历史有效值个数。
+    """
+
+    sorted_columns: dict[str, np.ndarray]
+
+    @classmethod
+    def from_columns(
+        cls, columns: Mapping[str, object], window: int | None = None
+    ) -> "PercentileIndex":
+        """columns 为 名称 -> 按时间排列的历史值；window 不为空时只保留最近 window 个值。"""
+        sorted_columns = {}
+        for name, values in columns.items():
+            values = np.asarray(values, dtype=float)
+            if window is not None:
+                values = values[-window:]
+            sorted_columns[name] = np.sort(values[~np.isnan(values)])
+        return cls(sorted_columns)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.sorted_columns
+
+    def percentile(self, name: str, values):
+        """一个或一批当前值在 name 列历史中的分位，当前值为 NaN 或没有历史时返回 NaN。"""
+        history = self.sorted_columns[name]
+        values = np.asarray(values, dtype=float)
+        if len(history) == 0:
+            result = np.full(values.shape, np.nan)
+        else:
+            result = np.searchsorted(history, values, side="right") / len(history)
+            result = np.where(np.isnan(values), np.nan, result)
+        return float(result) if result.ndim == 0 else result
+
+    def percentiles(self, current: Mapping[str, float]) -> dict[str, float]:
+        """名称 -> 当前值 的分位，索引中没有的列被忽略。"""
+        return {
+            name: self.percentile(name, value)
+            for name, value in current.items()
+            if name in self
+        }
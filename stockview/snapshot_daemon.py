@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable
+
+from stockview.helpers import market_time_helper
+from stockview.log import logger
+
+
+@dataclass(frozen=True, eq=False)
+class MarketSnapshot:
+    """后台线程发布的一份不可变行情快照，version 每次发布递增。"""
+
+    version: int
+    fetched_at: float
+    elapsed: float
+    data: Any  # build 的返回值，应当是不可变对象
+
+
+class SnapshotDaemon:
+    """
+    每个服务进程一个的后台刷新线程。
+
+    连续竞价时段内每 interval 秒调用一次 build 计算看板指标，休市期间每 idle_interval 秒
+    刷新一次（覆盖收盘后的数据修正和跨日），结果以新的 MarketSnapshot 整体替换发布。
+    还没有任何快照时（冷启动失败）不论是否休市都每 interval 秒重试。
+    页面只读取 latest()，渲染不再等待上游 I/O，刷新频率也与打开的标签页数量无关。
+    """
+
+    def __init__(
+        self,
+        build: Callable[[], Any],
+        interval=60,
+        idle_interval=1800,
+        market_time=market_time_helper,
+        before_refresh: Callable[[], None] | None = None,
+    ):
+        self.build = build
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.market_time = market_time
+        self.before_refresh = before_refresh
+        self._snapshot: MarketSnapshot | None = None
+        self._published = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self.last_error: BaseException | None = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="market-snapshot", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def latest(self) -> MarketSnapshot | None:
+        return self._snapshot
+
+    def wait_for_first(self, timeout=None) -> MarketSnapshot | None:
+        """
+        等待第一份快照发布，用于进程冷启动。
+
+        刷新失败（last_error 不为空）时立即返回 None，不必等到超时；调用方可以读取
+        last_error 展示原因，下一次重试在 interval 秒后。
+        """
+        with self._published:
+            self._published.wait_for(
+                lambda: self._snapshot is not None or self.last_error is not None, timeout
+            )
+        return self._snapshot
+
+    def refresh(self):
+        """计算并发布一份新快照，失败时保留上一份。"""
+        started = time.perf_counter()
+        try:
+            if self.before_refresh is not None:
+                self.before_refresh()
+            data = self.build()
+        except Exception as e:
+            with self._published:
+                self.last_error = e
+                self._published.notify_all()
+            logger.error(f"后台刷新行情快照失败，继续使用上一份快照：{str(e)}")
+            return None
+
+        previous = self._snapshot
+        snapshot = MarketSnapshot(
+            version=(previous.version if previous else 0) + 1,
+            fetched_at=time.time(),
+            elapsed=time.perf_counter() - started,
+            data=data,
+        )
+        with self._published:
+            self._snapshot = snapshot
+            self._published.notify_all()
+        self.last_error = None
+        logger.info(f"发布行情快照 v{snapshot.version}，耗时 {snapshot.elapsed:.2f} 秒")
+        return snapshot
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self._next_wait())
+
+    def _next_wait(self):
+        if self._snapshot is None:
+            # 冷启动失败：页面还没有任何数据可显示，按 interval 重试
+            return self.interval
+        now = datetime.now(self.market_time.tz)
+        # in_trading_session 按交易日历判断，午休、周末和节假日都不算交易时段
+        if self.market_time.in_trading_session(now):
+            return self.interval
+        # 休市期间（含午休）低频刷新，但开盘时立即恢复
+        until_open = (self.market_time.next_market_open(now) - now).total_seconds()
+        return max(1.0, min(self.idle_interval, until_open))
@@ -0,0 +1,246 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stockview.akcache import CacheWrapper, TtlPolicy
+from stockview.akcache import akcache as akcache_module
+from stockview.akcache.policy import CALENDAR, END_OF_DAY, INTRADAY, STATIC
+from stockview.helpers import MarketTimeHelper
+
+
+class FakeSource:
+    """代替 akshare 的上游：记录调用次数，可以注入延迟和异常。"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.error = None
+        self.version = 1
+        self._lock = threading.Lock()
+
+    def quote(self, symbol):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return pd.DataFrame({"symbol": [symbol], "version": [self.version]})
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def live_backend(monkeypatch):
+    for name in ("STOCKVIEW_AK_MODE", "STOCKVIEW_CACHE_DIR", "STOCKVIEW_SHARED_CACHE_DIR"):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(akcache_module, "time", clock)
+    return clock
+
+
+def version(frame):
+    return int(frame["version"].iloc[0])
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.01)
+
+
+def test_single_flight_shares_one_upstream_call():
+    source = FakeSource(delay=0.2)
+    wrapper = CacheWrapper(source)
+    barrier = threading.Barrier(8)
+
+    def call():
+        barrier.wait()
+        return wrapper.quote("000001")
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: call(), range(8)))
+
+    assert source.calls == 1
+    assert all(version(result) == 1 for result in results)
+
+
+def test_returned_frame_does_not_modify_cache():
+    wrapper = CacheWrapper(FakeSource())
+    frame = wrapper.quote("000001")
+    frame["version"] = 99
+    assert version(wrapper.quote("000001")) == 1
+
+
+def test_stale_while_revalidate_returns_old_value_and_refreshes(clock):
+    source = FakeSource()
+    wrapper = CacheWrapper(
+        source, cache_time=10, stale_while_revalidate=True, stale_time=100
+    )
+    assert version(wrapper.quote("000001")) == 1
+
+    clock.now += 15
+    source.version = 2
+    assert version(wrapper.quote("000001")) == 1
+    wait_until(lambda: source.calls == 2 and not wrapper._inflight)
+    assert version(wrapper.quote("000001")) == 2
+    assert source.calls == 2
+
+
+def test_last_good_value_is_used_while_upstream_fails(clock):
+    source = FakeSource()
+    wrapper = CacheWrapper(source, cache_time=10, stale_time=100)
+    wrapper.quote("000001")
+
+    source.error = ConnectionError("上游故障")
+    clock.now += 15
+    assert version(wrapper.quote("000001")) == 1
+    assert wrapper.entry_age("quote", "000001") == pytest.approx(15)
+
+    # 超过 stale_time 后不再返回旧值
+    clock.now += 200
+    with pytest.raises(ConnectionError):
+        wrapper.quote("000001")
+
+
+def test_failure_without_cached_value_raises():
+    source = FakeSource()
+    source.error = ConnectionError("上游故障")
+    wrapper = CacheWrapper(source, stale_time=100)
+    with pytest.raises(ConnectionError):
+        wrapper.quote("000001")
+    assert not wrapper._inflight
+
+
+def test_entry_overdue_uses_entry_ttl(clock):
+    wrapper = CacheWrapper(FakeSource(), cache_time=10, stale_time=100)
+    assert wrapper.entry_overdue("quote", "000001") is None
+    wrapper.quote("000001")
+    clock.now += 4
+    assert wrapper.entry_overdue("quote", "000001") == pytest.approx(-6)
+
+
+@pytest.mark.parametrize("tier", ["disk_dir", "shared_dir"])
+def test_disk_tiers_survive_a_new_wrapper(tmp_path, tier):
+    first = FakeSource()
+    CacheWrapper(first, **{tier: tmp_path}).quote("000001")
+
+    second = FakeSource()
+    second.version = 2
+    frame = CacheWrapper(second, **{tier: tmp_path}).quote("000001")
+
+    assert second.calls == 0
+    assert version(frame) == 1
+    assert frame["symbol"].tolist() == ["000001"]
+
+
+def test_shared_tier_fetches_once_across_wrappers(tmp_path):
+    sources = [FakeSource(delay=0.2) for _ in range(4)]
+    wrappers = [CacheWrapper(source, shared_dir=tmp_path) for source in sources]
+    barrier = threading.Barrier(len(wrappers))
+
+    def call(wrapper):
+        barrier.wait()
+        return wrapper.quote("000001")
+
+    with ThreadPoolExecutor(max_workers=len(wrappers)) as executor:
+        results = list(executor.map(call, wrappers))
+
+    assert sum(source.calls for source in sources) == 1
+    assert all(version(result) == 1 for result in results)
+
+
+def test_expired_disk_entry_is_refetched(tmp_path, clock):
+    CacheWrapper(FakeSource(), cache_time=10, disk_dir=tmp_path).quote("000001")
+
+    clock.now += 15
+    source = FakeSource()
+    source.version = 2
+    assert version(CacheWrapper(source, cache_time=10, disk_dir=tmp_path).quote("000001")) == 2
+    assert source.calls == 1
+
+
+# 2026-10-19（周一）按节假日处理，不在日历中
+TRADE_DATES = np.array(
+    ["2026-10-12", "2026-10-13", "2026-10-14", "2026-10-15", "2026-10-16", "2026-10-20"],
+    dtype="datetime64[D]",
+)
+
+
+@pytest.fixture
+def policy():
+    market_time = MarketTimeHelper(calendar_loader=lambda: TRADE_DATES)
+    return TtlPolicy(
+        policies={"spot": INTRADAY, "daily": END_OF_DAY, "info": STATIC, "dates": CALENDAR},
+        market_time=market_time,
+        settle_minutes=30,
+        intraday_history_ttl=1800,
+        static_ttl=7 * 24 * 3600,
+        calendar_ttl=24 * 3600,
+    )
+
+
+def at(policy, day, hour, minute=0):
+    year, month, date = map(int, day.split("-"))
+    return policy.market_time.tz.localize(datetime(year, month, date, hour, minute))
+
+
+@pytest.mark.parametrize(
+    "name, day, hour, minute, expected",
+    [
+        # 连续竞价时段
+        ("spot", "2026-10-14", 10, 0, 60),
+        ("daily", "2026-10-14", 10, 0, 1800),
+        # 午休：冻结到 13:00
+        ("spot", "2026-10-14", 12, 0, 3600),
+        ("daily", "2026-10-14", 12, 0, 3600),
+        # 盘前：有效到 09:30 开盘
+        ("spot", "2026-10-14", 8, 0, 5400),
+        ("daily", "2026-10-14", 8, 0, 5400),
+        # 收盘后 settle_minutes 内数据源还在修正
+        ("spot", "2026-10-14", 15, 10, 60),
+        ("daily", "2026-10-14", 15, 10, 1800),
+        # 收盘后有效到下一个交易日开盘
+        ("daily", "2026-10-14", 20, 0, 13.5 * 3600),
+        # 周五晚上跳过周末和周一的节假日，到周二开盘
+        ("spot", "2026-10-16", 20, 0, (3 * 24 + 13.5) * 3600),
+        # 节假日整天休市
+        ("daily", "2026-10-19", 10, 0, 23.5 * 3600),
+        # 固定 TTL 和未分类的函数
+        ("info", "2026-10-14", 10, 0, 7 * 24 * 3600),
+        ("dates", "2026-10-14", 10, 0, 24 * 3600),
+        ("other", "2026-10-14", 20, 0, 60),
+    ],
+)
+def test_ttl_classes(policy, name, day, hour, minute, expected):
+    assert policy(name, 60, now=at(policy, day, hour, minute)) == pytest.approx(expected)
+
+
+def test_ttl_is_never_shorter_than_default(policy):
+    # 09:29 距离开盘只有 60 秒，仍然使用 default_ttl
+    assert policy("spot", 300, now=at(policy, "2026-10-14", 9, 29)) == 300
+
+
+def test_calendar_failure_falls_back_to_weekdays():
+    def broken():
+        raise ConnectionError("上游故障")
+
+    market_time = MarketTimeHelper(calendar_loader=broken)
+    assert market_time.is_trading_day(datetime(2026, 10, 19).date())
+    assert not market_time.is_trading_day(datetime(2026, 10, 18).date())
@@ -0,0 +1,186 @@
+from bisect import bisect_right, insort
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stockview.limits import compute_limit_stats, limit_prices, limit_ratios
+from stockview.neighbors import EUCLIDEAN, MAHALANOBIS, FeatureSpace, smallest_k_order
+from stockview.percentiles import PercentileIndex, rolling_percentiles
+
+
+def sample_values(rng, n, m):
+    """小整数取值，制造大量并列，再混入 NaN。"""
+    values = rng.integers(0, 6, size=(n, m)).astype(float)
+    values[rng.random((n, m)) < 0.15] = np.nan
+    return values
+
+
+def brute_force_percentiles(values, window=None):
+    result = np.full(len(values), np.nan)
+    history = []
+    for t, value in enumerate(values):
+        if window is not None:
+            history = sorted(v for v in values[max(0, t - window + 1) : t + 1] if not np.isnan(v))
+        elif not np.isnan(value):
+            insort(history, value)
+        if not np.isnan(value):
+            result[t] = bisect_right(history, value) / len(history)
+    return result
+
+
+@pytest.mark.parametrize("window", [None, 1, 7, 40])
+def test_rolling_percentiles_match_bisect(window):
+    rng = np.random.default_rng(7)
+    values = sample_values(rng, 120, 3)
+    result = rolling_percentiles(values, window)
+    for column in range(values.shape[1]):
+        expected = brute_force_percentiles(values[:, column], window)
+        np.testing.assert_allclose(result[:, column], expected, equal_nan=True)
+
+
+def test_rolling_percentiles_one_dimensional_and_empty():
+    values = np.array([3.0, 1.0, np.nan, 3.0, 2.0])
+    np.testing.assert_allclose(
+        rolling_percentiles(values), [1.0, 0.5, np.nan, 1.0, 0.5], equal_nan=True
+    )
+    assert rolling_percentiles(np.array([])).shape == (0,)
+
+
+def test_percentile_index_matches_bisect():
+    rng = np.random.default_rng(11)
+    history = sample_values(rng, 200, 1)[:, 0]
+    queries = np.array([-1.0, 0.0, 2.5, 3.0, 5.0, 9.0, np.nan])
+
+    for window in (None, 30):
+        index = PercentileIndex.from_columns({"x": history}, window=window)
+        kept = history if window is None else history[-window:]
+        ordered = sorted(v for v in kept if not np.isnan(v))
+        expected = [
+            np.nan if np.isnan(q) else bisect_right(ordered, q) / len(ordered) for q in queries
+        ]
+        np.testing.assert_allclose(index.percentile("x", queries), expected, equal_nan=True)
+        assert index.percentile("x", 3.0) == pytest.approx(bisect_right(ordered, 3.0) / len(ordered))
+
+
+def test_percentile_index_without_history():
+    index = PercentileIndex.from_columns({"x": [np.nan, np.nan], "y": [1.0, 2.0]})
+    assert np.isnan(index.percentile("x", 1.0))
+    assert index.percentiles({"y": 1.5, "z": 1.0}) == {"y": 0.5}
+
+
+@pytest.mark.parametrize("k", [0, 1, 3, 10, 50])
+def test_smallest_k_order_matches_nsmallest(k):
+    rng = np.random.default_rng(3)
+    values = rng.integers(0, 5, size=40).astype(float)
+    values[[2, 9, 17]] = np.nan
+    # NaN 不参与排序，k 超过有效值个数时只返回有效值
+    expected = pd.Series(values).dropna().nsmallest(k, keep="first").index.to_numpy()
+    np.testing.assert_array_equal(smallest_k_order(values, k), expected)
+
+
+def feature_frame(rng, n=90):
+    # 取值较粗，距离经常并列，检查边界上的并列是否按行号取
+    frame = pd.DataFrame(
+        rng.integers(0, 4, size=(n, 3)).astype(float), columns=["a", "b", "c"]
+    )
+    frame.iloc[rng.choice(n, 6, replace=False), 1] = np.nan
+    return frame
+
+
+@pytest.mark.parametrize("weights", [None, {"a": 2.0, "c": 0.5}])
+@pytest.mark.parametrize("chunk_size", [1, 16, 256])
+def test_causal_neighbors_match_row_by_row_queries(weights, chunk_size):
+    rng = np.random.default_rng(5)
+    frame = feature_frame(rng)
+    eligible = rng.random(len(frame)) > 0.2
+    space = FeatureSpace.from_frame(frame, ["a", "b", "c"], weights=weights)
+    k, gap = 5, 3
+
+    rows, distances = space.causal_neighbors(k, gap, eligible=eligible, chunk_size=chunk_size)
+
+    for t in range(len(frame)):
+        all_distances = space.distances(frame.iloc[t])
+        usable = eligible & (np.arange(len(frame)) <= t - gap)
+        expected = smallest_k_order(np.where(usable, all_distances, np.nan), k)
+        if np.isnan(all_distances[t]):
+            expected = expected[:0]  # 查询日自身特征不完整
+        found = rows[t][rows[t] >= 0]
+        np.testing.assert_array_equal(found, expected)
+        np.testing.assert_allclose(distances[t, : len(found)], all_distances[expected])
+        assert np.isnan(distances[t, len(found) :]).all()
+
+
+def test_mahalanobis_rejects_weights_and_walk_forward():
+    frame = feature_frame(np.random.default_rng(1))
+    with pytest.raises(ValueError):
+        FeatureSpace.from_frame(frame, ["a", "b"], weights={"a": 2.0}, metric=MAHALANOBIS)
+    space = FeatureSpace.from_frame(frame, ["a", "b"], metric=MAHALANOBIS)
+    assert space.distances(frame.iloc[0]).shape == (len(frame),)
+    with pytest.raises(ValueError):
+        space.causal_neighbors(3, 1)
+    with pytest.raises(ValueError):
+        FeatureSpace.from_frame(frame, ["a"], metric="cosine")
+    assert FeatureSpace.from_frame(frame, ["a"]).metric == EUCLIDEAN
+
+
+@pytest.mark.parametrize(
+    "code, name, ratio",
+    [
+        ("600000", "浦发银行", 0.10),
+        ("000001", "平安银行", 0.10),
+        ("300750", "宁德时代", 0.20),
+        ("688981", "中芯国际", 0.20),
+        ("830799", "艾融软件", 0.30),
+        ("920002", "万达轴承", 0.30),
+        ("430047", "诺思兰德", 0.30),
+        # 主板 ST 为 5%，创业板、科创板的 ST 沿用板块限制
+        ("600518", "ST康美", 0.05),
+        ("000004", "*ST国华", 0.05),
+        ("300313", "*ST天山", 0.20),
+        ("688086", "ST紫晶", 0.20),
+        # 上市首日和注册制新股前 5 日不设涨跌幅限制
+        ("001391", "N国货", np.nan),
+        ("301622", "C英思特", np.nan),
+    ],
+)
+def test_limit_ratios_per_board(code, name, ratio):
+    result = limit_ratios(np.array([code]), np.array([name]))[0]
+    if np.isnan(ratio):
+        assert np.isnan(result)
+    else:
+        assert result == pytest.approx(ratio)
+
+
+@pytest.mark.parametrize(
+    "prev_close, ratio, up, down",
+    [
+        (12.35, 0.10, 13.59, 11.12),  # 13.585 和 11.115 按四舍五入进位，不是银行家舍入
+        (12.35, 0.20, 14.82, 9.88),
+        (11.11, 0.10, 12.22, 10.0),
+        (10.01, 0.05, 10.51, 9.51),  # ST：10.5105 / 9.5095
+        (3.33, 0.30, 4.33, 2.33),
+    ],
+)
+def test_limit_prices_round_half_up(prev_close, ratio, up, down):
+    up_price, down_price = limit_prices(np.array([prev_close]), np.array([ratio]))
+    assert up_price[0] == pytest.approx(up)
+    assert down_price[0] == pytest.approx(down)
+
+
+def test_compute_limit_stats():
+    spot = pd.DataFrame(
+        {
+            "代码": ["600000", "300750", "600518", "000001", "600001", "600003", "001391", "600002"],
+            "名称": ["浦发银行", "宁德时代", "ST康美", "平安银行", "炸板", "接近涨停", "N国货", "停牌"],
+            "最新价": [11.0, 12.0, 10.51, 9.0, 10.5, 10.95, 20.0, np.nan],
+            "最高": [11.0, 12.0, 10.51, 9.5, 11.0, 10.96, 20.0, np.nan],
+            "昨收": [10.0, 10.0, 10.01, 10.0, 10.0, 10.0, 10.0, 10.0],
+        }
+    )
+    stats = compute_limit_stats(spot)
+    assert stats.limit_up == 3
+    assert stats.limit_down == 1
+    assert stats.broken == 1
+    assert stats.near_limit_up == 1
+    assert stats.near_limit_down == 0